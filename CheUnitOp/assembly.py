@@ -0,0 +1,210 @@
+import numpy as np
+from scipy.sparse import coo_matrix, csr_matrix, identity, kron, bmat
+from scipy.sparse.csgraph import connected_components
+
+def buildFlowMatrix(volumes, feedIDs, targetIDs, flowRates):
+    """
+    Builds the component level flow matrix F for dc / dt = F * c, where c holds
+    the concentration of one species in every component. Each connection moves
+    flowRate m^3/s from the feed component to the target component, giving
+
+        F[target, feed] += flowRate / volume[target]
+        F[feed, feed]   -= flowRate / volume[feed]
+
+    Connections with an ID of -1 on either side lead to or from a boundary
+    component, which is not part of F.
+
+    Args:
+        volumes:   Array of component volumes indexed by component ID
+        feedIDs:   Array of feed component IDs, one per connection
+        targetIDs: Array of target component IDs, one per connection
+        flowRates: Array of volumetric flow rates, one per connection
+    """
+    volumes = np.asarray(volumes, dtype=float)
+    feedIDs = np.asarray(feedIDs, dtype=np.int64)
+    targetIDs = np.asarray(targetIDs, dtype=np.int64)
+    flowRates = np.asarray(flowRates, dtype=float)
+    numComponents = len(volumes)
+
+    isInternalLink = (feedIDs >= 0) & (targetIDs >= 0)
+    isInternalFeed = feedIDs >= 0
+
+    linkFeeds = feedIDs[isInternalLink]
+    linkTargets = targetIDs[isInternalLink]
+    outFeeds = feedIDs[isInternalFeed]
+
+    rows = np.concatenate((linkTargets, outFeeds))
+    cols = np.concatenate((linkFeeds, outFeeds))
+    data = np.concatenate((flowRates[isInternalLink] / volumes[linkTargets],
+        -flowRates[isInternalFeed] / volumes[outFeeds]))
+
+    # Duplicate entries are summed when converting to CSR
+    return coo_matrix((data, (rows, cols)),
+        shape = (numComponents, numComponents)).tocsr()
+
+def checkMassBalance(numComponents, feedIDs, targetIDs, flowRates):
+    """
+    Checks that the volumetric flow into every component equals the flow out
+    of it, so that the liquid volumes do not change with time. Connection ends
+    with an ID of -1 are boundary components and are not checked.
+
+    Args:
+        numComponents: Number of components
+        feedIDs:       Array of feed component IDs, one per connection
+        targetIDs:     Array of target component IDs, one per connection
+        flowRates:     Array of volumetric flow rates, one per connection
+    """
+    feedIDs = np.asarray(feedIDs, dtype=np.int64)
+    targetIDs = np.asarray(targetIDs, dtype=np.int64)
+    flowRates = np.asarray(flowRates, dtype=float)
+    isFeed = feedIDs >= 0
+    isTarget = targetIDs >= 0
+    outletFlowRates = np.bincount(feedIDs[isFeed], weights = flowRates[isFeed],
+        minlength = numComponents)
+    inletFlowRates = np.bincount(targetIDs[isTarget], weights = flowRates[isTarget],
+        minlength = numComponents)
+    assert(np.allclose(inletFlowRates, outletFlowRates))
+
+def getClosedClasses(A, weights, tolerance = 1e-10):
+    """
+    Gets the closed classes of a transition matrix. A closed class is a
+    strongly connected group of DOFs that nothing flows out of and that loses
+    no mass, like a recycle loop without an outlet or a tank without
+    connections. Every closed class makes A singular. Mass is measured as
+    the DOF weight times the concentration, so a class loses no mass when
+    the weighted column sums of A vanish on it. Returns a list of DOF index
+    arrays, one per closed class.
+
+    Args:
+        A:         Sparse transition matrix
+        weights:   Weight of every DOF, the volume of its component
+        tolerance: Largest relative mass loss of a DOF in a closed class
+    """
+    A = csr_matrix(A)
+    numSCCs, sccIDs = connected_components(A, directed = True, connection = 'strong')
+    # An entry A[target, feed] outside a class is a flow out of the feed class
+    coo = A.tocoo()
+    isLeaving = (sccIDs[coo.row] != sccIDs[coo.col]) & (coo.data != 0.0)
+    isOpen = np.zeros(numSCCs, dtype=bool)
+    isOpen[sccIDs[coo.col[isLeaving]]] = True
+    # Relative rate of mass loss of every DOF, to outlets or by reactions
+    weights = np.asarray(weights, dtype=float)
+    massLoss = np.abs(A.T @ weights)
+    scale = weights * np.abs(A.diagonal())
+    relativeLoss = np.divide(massLoss, scale, out = np.zeros_like(massLoss), where = scale > 0.0)
+    isLossy = np.bincount(sccIDs, weights = relativeLoss > tolerance, minlength = numSCCs) > 0
+    closedSCCs = np.flatnonzero(~isOpen & ~isLossy)
+    order = np.argsort(sccIDs, kind = 'stable')
+    starts = np.searchsorted(sccIDs[order], np.arange(numSCCs + 1))
+    return [order[starts[scc]:starts[scc+1]] for scc in closedSCCs]
+
+def buildFeedMatrix(volumes, numBoundaries, boundaryIDs, targetIDs, flowRates):
+    """
+    Builds the boundary feed matrix G. Multiplying G by the (boundaries x
+    species) array of boundary concentrations gives the source term of every
+    species in every component,
+
+        G[target, boundary] += flowRate / volume[target]
+
+    Only connections from a boundary component (boundaryID >= 0) to a regular
+    component (targetID >= 0) contribute.
+
+    Args:
+        volumes:       Array of component volumes indexed by component ID
+        numBoundaries: Number of boundary components
+        boundaryIDs:   Array of feed boundary component IDs, one per connection
+        targetIDs:     Array of target component IDs, one per connection
+        flowRates:     Array of volumetric flow rates, one per connection
+    """
+    volumes = np.asarray(volumes, dtype=float)
+    boundaryIDs = np.asarray(boundaryIDs, dtype=np.int64)
+    targetIDs = np.asarray(targetIDs, dtype=np.int64)
+    flowRates = np.asarray(flowRates, dtype=float)
+
+    isFeed = (boundaryIDs >= 0) & (targetIDs >= 0)
+    rows = targetIDs[isFeed]
+    cols = boundaryIDs[isFeed]
+    data = flowRates[isFeed] / volumes[rows]
+    return coo_matrix((data, (rows, cols)),
+        shape = (len(volumes), numBoundaries)).tocsr()
+
+def augmentMatrix(A, S):
+    """
+    Builds the augmented matrix
+
+        [[A, S],
+         [0, 0]]
+
+    for the affine system dy / dt = A * y + S * u with constant inputs u.
+    Stacking u below y gives a homogeneous system whose matrix exponential
+    integrates the source term exactly.
+
+    Args:
+        A: Sparse transition matrix
+        S: Sparse or dense input matrix with one column per input
+    """
+    S = csr_matrix(S)
+    zeros = csr_matrix((S.shape[1], S.shape[1]))
+    return bmat([[A, S], [None, zeros]], format = 'csr')
+
+def expandSpecies(F, numSpecies):
+    """
+    Expands the component level flow matrix to every species. Species are not
+    coupled through flow, so the transition matrix is F kron I_species with the
+    species index running fastest:
+
+        DOF = componentID * numSpecies + speciesID
+
+    Args:
+        F:          Sparse component level flow matrix
+        numSpecies: Number of species in the system
+    """
+    return kron(F, identity(numSpecies, format = 'csr'), format = 'csr')
+
+def buildReactionMatrix(numComponents, numSpecies, reactantIDs, productIDs,
+    rateConstants, productFractions, componentIDs):
+    """
+    Builds the DOF level matrix of first order reaction terms. Each reaction
+    adds
+
+        R[reactant, reactant] -= rateConstant
+        R[product, reactant]  += productFraction * rateConstant
+
+    to the species block of the components it takes place in. Reactions with a
+    componentID of -1 take place in every component and are expanded with
+    I_components kron R, the rest are placed directly from COO index arrays.
+    A productID of -1 means the reactant leaves without a tracked product.
+
+    Args:
+        numComponents:    Number of components
+        numSpecies:       Number of species
+        reactantIDs:      Array of reactant species IDs, one per reaction
+        productIDs:       Array of product species IDs, one per reaction
+        rateConstants:    Array of rate constants in 1/s, one per reaction
+        productFractions: Array of product fractions, one per reaction
+        componentIDs:     Array of component IDs, one per reaction
+    """
+    reactantIDs = np.asarray(reactantIDs, dtype=np.int64)
+    productIDs = np.asarray(productIDs, dtype=np.int64)
+    rateConstants = np.asarray(rateConstants, dtype=float)
+    productFractions = np.asarray(productFractions, dtype=float)
+    componentIDs = np.asarray(componentIDs, dtype=np.int64)
+
+    hasProduct = productIDs >= 0
+    speciesRows = np.concatenate((reactantIDs, productIDs[hasProduct]))
+    speciesCols = np.concatenate((reactantIDs, reactantIDs[hasProduct]))
+    data = np.concatenate((-rateConstants,
+        productFractions[hasProduct] * rateConstants[hasProduct]))
+    entryComponentIDs = np.concatenate((componentIDs, componentIDs[hasProduct]))
+
+    isGlobal = entryComponentIDs < 0
+    R = coo_matrix((data[isGlobal], (speciesRows[isGlobal], speciesCols[isGlobal])),
+        shape = (numSpecies, numSpecies))
+    globalTerms = kron(identity(numComponents, format = 'csr'), R, format = 'csr')
+
+    isLocal = ~isGlobal
+    offsets = entryComponentIDs[isLocal] * numSpecies
+    DOFs = numComponents * numSpecies
+    localTerms = coo_matrix((data[isLocal], (offsets + speciesRows[isLocal],
+        offsets + speciesCols[isLocal])), shape = (DOFs, DOFs)).tocsr()
+    return globalTerms + localTerms
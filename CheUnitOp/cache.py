@@ -0,0 +1,345 @@
+from collections import OrderedDict
+import hashlib
+import os
+import threading
+
+import numpy as np
+from scipy.sparse import issparse
+
+from CheUnitOp.solver import DensePropagator, SparsePropagator
+
+def matrixKey(A):
+    """
+    Builds a hashable key from the contents of a matrix. Two matrices with the
+    same shape and the same coefficients give the same key, so the key captures
+    both the topology and the parameters (volumes, flow rates, fractions) of the
+    system the matrix was built from. The matrix is never changed, so a
+    matrix shared between threads can be hashed safely.
+
+    Args:
+        A: Sparse or dense matrix
+    """
+    digest = hashlib.sha1()
+    if issparse(A):
+        A = A.tocsr()
+        if not A.has_canonical_format:
+            A = A.copy()
+            A.sum_duplicates()
+        digest.update(np.asarray(A.shape, dtype=np.int64).tobytes())
+        digest.update(np.ascontiguousarray(A.indptr, dtype=np.int64).tobytes())
+        digest.update(np.ascontiguousarray(A.indices, dtype=np.int64).tobytes())
+        digest.update(np.ascontiguousarray(A.data, dtype=np.float64).tobytes())
+    else:
+        A = np.ascontiguousarray(A, dtype=np.float64)
+        digest.update(np.asarray(A.shape, dtype=np.int64).tobytes())
+        digest.update(A.tobytes())
+    return digest.hexdigest()
+
+class PropagatorCache:
+    """
+    Least recently used cache of step propagators exp(A * dt). A propagator is
+    built by the solver the first time a (solver, matrix, dt) combination is
+    requested and reused for every following step and solve with the same
+    combination.
+
+    A cache can be shared by solves running in several threads. A propagator
+    that is requested by several threads at once is only built once, the
+    other threads wait for it, while propagators with different keys are
+    built in parallel. A pickled cache, e.g. one sent to a worker process,
+    is unpickled empty.
+
+    Args:
+        maxSize: Maximum number of propagators held in the cache
+    """
+    def __init__(self, maxSize = 16):
+        assert(maxSize > 0)
+        self.maxSize = maxSize
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.__propagators = OrderedDict()
+        self.__buildLocks = {}
+
+    def getPropagator(self, A, dt, solver, stats = None):
+        """
+        Gets the propagator for exp(A * dt), building it only on a cache miss
+
+        Args:
+            A:      Transition matrix, sparse or dense
+            dt:     Time step size
+            solver: Solver object that builds the propagator on a cache miss
+            stats:  Stats object the build is recorded in as the
+                    buildPropagator phase, None records nothing
+        """
+        key = (solver.getKey(), matrixKey(A), float(dt))
+        with self._lock:
+            propagator = self.__lookup(key)
+            if propagator is not None:
+                return propagator
+            buildLock = self.__buildLocks.setdefault(key, threading.Lock())
+
+        # Only one thread builds a propagator, the others find it in the
+        # cache once they get the build lock
+        with buildLock:
+            with self._lock:
+                propagator = self.__lookup(key)
+                if propagator is None:
+                    self.misses += 1
+            if propagator is None:
+                if stats is not None:
+                    stats.startPhase('buildPropagator')
+                propagator = self._buildPropagator(key, A, dt, solver)
+                if stats is not None:
+                    stats.endPhase('buildPropagator', A)
+                with self._lock:
+                    self.__propagators[key] = propagator
+                    if len(self.__propagators) > self.maxSize:
+                        self.__propagators.popitem(last = False)
+                    self.__buildLocks.pop(key, None)
+        return propagator
+
+    def _buildPropagator(self, key, A, dt, solver):
+        """
+        Builds a propagator on a cache miss
+
+        Args:
+            key:    Cache key of the propagator
+            A:      Transition matrix, sparse or dense
+            dt:     Time step size
+            solver: Solver object that builds the propagator
+        """
+        return solver.buildPropagator(A, dt)
+
+    def clear(self):
+        """
+        Removes all propagators from the cache and resets the counters
+        """
+        with self._lock:
+            self.__propagators.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __lookup(self, key):
+        """
+        Gets a cached propagator and marks it as recently used, or None on a
+        miss. Must be called with the lock held.
+
+        Args:
+            key: Cache key of the propagator
+        """
+        propagator = self.__propagators.get(key)
+        if propagator is not None:
+            self.hits += 1
+            self.__propagators.move_to_end(key)
+        return propagator
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for name in ('_lock', '_PropagatorCache__propagators', '_PropagatorCache__buildLocks'):
+            del state[name]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        self.__propagators = OrderedDict()
+        self.__buildLocks = {}
+
+    def __len__(self):
+        return len(self.__propagators)
+
+class PropagatorLadder:
+    """
+    Propagators for a ladder of step sizes baseStep * 2^level, used by
+    adaptive stepping. Matrix propagators of a level are built by squaring
+    the level below, exp(A * 2h) = exp(A * h)^2, which is much cheaper than a
+    new exponential. Rounding errors grow by about a factor of two with every
+    squaring, so every rebuildEvery-th level is built by the solver instead,
+    through the propagator cache. Propagators without a matrix, like those of
+    the KrylovSolver, are always built by the solver.
+
+    Args:
+        A:               Transition matrix
+        baseStep:        Step size of level 0
+        solver:          Solver object that builds the propagators
+        propagatorCache: Cache the solver built propagators are fetched from
+        rebuildEvery:    Number of levels between solver built propagators
+        stats:           Stats object the builds and squarings are recorded in
+                         as the buildPropagator phase, None records nothing
+    """
+    def __init__(self, A, baseStep, solver, propagatorCache, rebuildEvery = 8, stats = None):
+        assert(baseStep > 0.0)
+        assert(rebuildEvery >= 1)
+        self.A = A
+        self.baseStep = baseStep
+        self.solver = solver
+        self.propagatorCache = propagatorCache
+        self.rebuildEvery = rebuildEvery
+        self.stats = stats
+        self.__propagators = {}
+
+    def getStep(self, level):
+        """
+        Gets the step size of a level
+
+        Args:
+            level: Level of the ladder
+        """
+        return self.baseStep * 2.0**level
+
+    def getPropagator(self, level):
+        """
+        Gets the propagator of a level, building the levels below it that are
+        needed for the squaring
+
+        Args:
+            level: Level of the ladder, >= 0
+        """
+        assert(level >= 0)
+        if level in self.__propagators:
+            return self.__propagators[level]
+        below = None
+        if level % self.rebuildEvery != 0:
+            below = self.getPropagator(level - 1)
+        if isinstance(below, (DensePropagator, SparsePropagator)):
+            if self.stats is not None:
+                self.stats.startPhase('buildPropagator')
+            propagator = type(below)(below.matrix @ below.matrix)
+            if self.stats is not None:
+                self.stats.endPhase('buildPropagator', self.A)
+        else:
+            propagator = self.propagatorCache.getPropagator(self.A, self.getStep(level),
+                self.solver, self.stats)
+        self.__propagators[level] = propagator
+        return propagator
+
+    def __len__(self):
+        return len(self.__propagators)
+
+class DiskPropagatorCache(PropagatorCache):
+    """
+    Propagator cache that also keeps dense propagators in .npy files in a
+    directory, so they survive restarts and are shared by every process using
+    the same directory. Files are loaded as read only memory maps, so a
+    propagator is never copied into memory on load.
+
+    Files are named by a hash of the solver key, the contents of the
+    transition matrix and dt. The transition matrix holds every volume, flow
+    rate, flow fraction and rate constant of the system, so any parameter
+    change gives a new key and stale files are never used. Files that are no
+    longer requested are removed, least recently used first, once the
+    directory holds more than maxBytes. Propagators that are not dense, like
+    those of the KrylovSolver, are only cached in memory.
+
+    Args:
+        directory: Directory the propagator files are stored in
+        maxBytes:  Maximum total size of the propagator files
+        maxSize:   Maximum number of propagators held in memory
+    """
+    def __init__(self, directory, maxBytes = 2**30, maxSize = 16):
+        assert(maxBytes > 0)
+        PropagatorCache.__init__(self, maxSize)
+        self.directory = directory
+        self.maxBytes = maxBytes
+        self.diskHits = 0
+        os.makedirs(directory, exist_ok = True)
+
+    def _buildPropagator(self, key, A, dt, solver):
+        fileName = self.__getFileName(key)
+        try:
+            matrix = np.load(fileName, mmap_mode = 'r')
+        except (OSError, ValueError):
+            matrix = None
+        if matrix is not None and matrix.shape == (A.shape[0], A.shape[0]):
+            # Marks the file as recently used for eviction. Another process
+            # may have evicted it since, the memory map stays valid.
+            try:
+                os.utime(fileName)
+            except OSError:
+                pass
+            with self._lock:
+                self.diskHits += 1
+            return DensePropagator(matrix)
+
+        propagator = solver.buildPropagator(A, dt)
+        if isinstance(propagator, DensePropagator) and propagator.matrix.nbytes <= self.maxBytes:
+            # Writes to a temporary file first so other processes and threads
+            # never load a partially written file
+            tempFileName = (fileName + '.' + str(os.getpid()) + '.' +
+                str(threading.get_ident()) + '.tmp')
+            with open(tempFileName, 'wb') as file:
+                np.save(file, np.ascontiguousarray(propagator.matrix))
+            os.replace(tempFileName, fileName)
+            self.__evict(fileName)
+        return propagator
+
+    def clearDisk(self):
+        """
+        Removes all propagator files and clears the in memory cache
+        """
+        for fileName in self.__getFileNames():
+            self.__remove(fileName)
+        with self._lock:
+            self.diskHits = 0
+        self.clear()
+
+    def getDiskSize(self):
+        """
+        Gets the total size of the propagator files in bytes
+        """
+        return sum(os.path.getsize(fileName) for fileName in self.__getFileNames())
+
+    def __getFileName(self, key):
+        """
+        Gets the file name of a cache key. repr of the key is deterministic
+        since the key only holds strings, numbers and tuples.
+
+        Args:
+            key: Cache key of the propagator
+        """
+        digest = hashlib.sha1(repr(key).encode()).hexdigest()
+        return os.path.join(self.directory, digest + '.npy')
+
+    def __getFileNames(self):
+        """
+        Gets the paths of all propagator files in the directory
+        """
+        return [os.path.join(self.directory, fileName)
+            for fileName in os.listdir(self.directory) if fileName.endswith('.npy')]
+
+    def __evict(self, keepFileName):
+        """
+        Removes the least recently used files until the directory fits in
+        maxBytes
+
+        Args:
+            keepFileName: File that was just written and is never removed
+        """
+        files = []
+        for fileName in self.__getFileNames():
+            try:
+                fileStat = os.stat(fileName)
+            except OSError:
+                continue
+            files.append((fileStat.st_mtime, fileStat.st_size, fileName))
+        totalBytes = sum(file[1] for file in files)
+        for _, size, fileName in sorted(files):
+            if totalBytes <= self.maxBytes:
+                break
+            if fileName != keepFileName and self.__remove(fileName):
+                totalBytes -= size
+
+    @staticmethod
+    def __remove(fileName):
+        """
+        Removes a file and returns whether it was removed. Files that are
+        still memory mapped can not be removed on every platform and are kept.
+
+        Args:
+            fileName: Path of the file
+        """
+        try:
+            os.remove(fileName)
+        except OSError:
+            return False
+        return True
@@ -1,5 +1,4 @@
 from abc import ABC
-from numpy import isclose
 from collections.abc import Iterable
 from sys import exit
 
@@ -13,6 +12,8 @@ class ComponentBase(ABC):
         name:               Name of the component
         volume:             Volume of the component in m^3
     """
+    __slots__ = ('name', 'volume', 'volumetricFlowRate', 'inletComponents',
+        'outletComponents', 'species', 'isBoundaryComponent', 'ID')
 
     def __init__(self, name, volume):
         assert(isinstance(name, str))
@@ -73,7 +74,7 @@ class ComponentBase(ABC):
         print("Volume (m^3): " + str(self.volume))
         print("Species: ")
         for spec in self.species:
-            print("\t " + spec.name + ": Initial Mass: " + str(spec.initialMass))
+            print("\t " + spec.name + ": Concentration: " + str(spec.getCon()))
         print("Inlet Components:")
         for componentTuple in self.inletComponents:
             print("\t Name: " + componentTuple[1].name)
@@ -91,23 +92,11 @@ class ComponentBase(ABC):
         Args:
             species: Component species object that gets added.
         """
+        # The species of a finalized component are views into the species
+        # table of the system and can not be added to
+        assert(isinstance(self.species, list))
         self.species.append(species)
 
-    def _checkInletOutletFlowRates(self):
-        """
-        Checks the inlet and outlet volumetric flow rates to make sure they
-        equal one another. This is to make sure that the liquid volume of the
-        tank does not change with time, as this is an assumption when solving
-        the ODEs.
-        """
-        inletVolumeFlowRate = 0.0
-        for flowComponentTuple in self.inletComponents:
-            inletVolumeFlowRate += flowComponentTuple[0] * self.volumetricFlowRate
-        outletVolumeFlowRate = 0.0
-        for flowComponentTuple in self.outletComponents:
-            outletVolumeFlowRate += flowComponentTuple[0] * self.volumetricFlowRate
-        assert(isclose(inletVolumeFlowRate, outletVolumeFlowRate))
-
 class InletBoundaryCondition(ComponentBase):
     """
     Adds an inlet boundary condition to the system by adding a fictitous tank
@@ -116,17 +105,12 @@ class InletBoundaryCondition(ComponentBase):
     Args:
         name: Name of the inlet boundary condition
     """
+    __slots__ = ()
+
     def __init__(self, name = "Inlet Boundary Condition"):
         super(InletBoundaryCondition, self).__init__(name, 1.0)
         self.isBoundaryComponent = True
 
-    def _checkInletOutletFlowRates(self):
-        """
-        Over rides the base class check inlet/outlet flow rates because the
-        inlet and outlet flow rates will not be equal.
-        """
-        pass
-
 
 class OutletBoundaryCondition(ComponentBase):
     """
@@ -138,20 +122,15 @@ class OutletBoundaryCondition(ComponentBase):
     Args:
         name: Name of the outlet boundary condition
     """
+    __slots__ = ()
+
     def __init__(self, name = "Outlet Boundary Condition"):
         super(OutletBoundaryCondition, self).__init__(name, 1.0)
         self.isBoundaryComponent = True
 
-    def _checkInletOutletFlowRates(self):
-        """
-        Over rides the base class check inlet/outlet flow rates because the
-        inlet and outlet flow rates will not be equal.
-        """
-        pass
-
 class GenericTank(ComponentBase):
     """
     A generic tank that hold fluid and allows for species to flow into, mix and
     flow out.
     """
-    pass
+    __slots__ = ()
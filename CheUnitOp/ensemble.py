@@ -0,0 +1,72 @@
+import numpy as np
+
+class Variant:
+    """
+    One variant of a finalized system for an ensemble solve. Parameters that
+    are not given keep the values set on the system, so a variant only lists
+    what it changes. Components and species are referenced by name.
+
+    Args:
+        volumes:                Dict of component name: volume in m^3
+        volumetricFlowRate:     System volumetric flow rate in m^3/s
+        flowFractions:          Dict of (feed name, target name): flow fraction,
+                                replacing an absolute flow rate
+        flowRates:              Dict of (feed name, target name): absolute flow
+                                rate in m^3/s, replacing the flow fraction
+        initialConcentrations:  Dict of (component name, species name): initial
+                                concentration in kg/m^3
+        boundaryConcentrations: Dict of (boundary name, species name):
+                                concentration in kg/m^3
+    """
+    def __init__(self, volumes = None, volumetricFlowRate = None, flowFractions = None,
+        initialConcentrations = None, boundaryConcentrations = None, flowRates = None):
+        assert(volumetricFlowRate is None or volumetricFlowRate >= 0.0)
+        self.volumes = dict(volumes) if volumes else {}
+        self.volumetricFlowRate = volumetricFlowRate
+        self.flowFractions = dict(flowFractions) if flowFractions else {}
+        self.flowRates = dict(flowRates) if flowRates else {}
+        self.initialConcentrations = dict(initialConcentrations) if initialConcentrations else {}
+        self.boundaryConcentrations = dict(boundaryConcentrations) if boundaryConcentrations else {}
+        for volume in self.volumes.values():
+            assert(volume > 0.0)
+
+    def getConfiguration(self):
+        """
+        Gets the parameter overrides of the variant in the same form as a
+        schedule configuration
+        """
+        return {'volumes': self.volumes,
+            'volumetricFlowRate': self.volumetricFlowRate,
+            'flowFractions': self.flowFractions,
+            'flowRates': self.flowRates,
+            'boundaryConcentrations': self.boundaryConcentrations}
+
+def propagateGroup(A, sol, dt, savedSteps, solver, propagatorCache = None):
+    """
+    Advances a block of solution columns that share one transition matrix and
+    returns the stored steps as an array of shape (stored steps, rows,
+    columns). This is a module level function so it can run in a worker
+    process.
+
+    Args:
+        A:               Sparse transition matrix shared by every column
+        sol:             Initial solution, one column per solution
+        dt:              Time step size
+        savedSteps:      Sorted step numbers that are stored, starting at 0
+        solver:          Solver object that builds the propagator
+        propagatorCache: Cache the propagator is fetched from, None builds it
+                         directly
+    """
+    if propagatorCache is None:
+        propagator = solver.buildPropagator(A, dt)
+    else:
+        propagator = propagatorCache.getPropagator(A, dt, solver)
+    solutions = np.empty((len(savedSteps),) + sol.shape)
+    solutions[0] = sol
+    nextSave = 1
+    for step in range(1, savedSteps[-1]+1):
+        sol = propagator.apply(sol)
+        if step == savedSteps[nextSave]:
+            solutions[nextSave] = sol
+            nextSave += 1
+    return solutions
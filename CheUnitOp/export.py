@@ -0,0 +1,50 @@
+import numpy as np
+
+def getSolutionTable(system):
+    """
+    Gets the solution of a solved system as a table. Returns the column names
+    and a 2D array with one row per stored step. The first column is the time
+    and every other column is the concentration of one species in one
+    component, named <component name>/<species name>. Columns are ordered by
+    component ID and then species ID, like the solution array.
+
+    Args:
+        system: Solved system object
+    """
+    assert(system.solutionArray is not None)
+    columnNames = ["Time"]
+    for component in system.components:
+        for spec in system.globalSpecies:
+            columnNames.append(f"{component.name}/{spec.name}")
+    numSteps = system.solutionArray.shape[0]
+    table = np.empty((numSteps, len(columnNames)))
+    table[:, 0] = system.timeSteps
+    table[:, 1:] = np.reshape(system.solutionArray, (numSteps, -1))
+    return columnNames, table
+
+def exportCSV(system, fileName, delimiter = ","):
+    """
+    Writes the solution of a solved system to a CSV file with a header row.
+    See getSolutionTable for the columns.
+
+    Args:
+        system:    Solved system object
+        fileName:  Name of the CSV file
+        delimiter: Column delimiter
+    """
+    columnNames, table = getSolutionTable(system)
+    np.savetxt(fileName, table, delimiter = delimiter,
+        header = delimiter.join(columnNames), comments = "")
+
+def exportColumns(system, fileName):
+    """
+    Writes the solution of a solved system to a columnar .npz file with one
+    named array per column, so single columns can be loaded without reading
+    the rest. See getSolutionTable for the columns.
+
+    Args:
+        system:   Solved system object
+        fileName: Name of the .npz file
+    """
+    columnNames, table = getSolutionTable(system)
+    np.savez(fileName, **{name: table[:, i] for i, name in enumerate(columnNames)})
@@ -0,0 +1,65 @@
+import numpy as np
+
+from CheUnitOp.assembly import checkMassBalance
+
+class FlowGraph:
+    """
+    Sparse component level flow graph of a system with one edge per
+    connection. Edges are stored as arrays in coordinate form. A feed or
+    target that is a boundary component has an ID of -1 and its boundary ID
+    in feedBoundaryIDs or targetBoundaryIDs, otherwise the boundary ID is -1.
+
+    Every connection carries
+
+        flowFraction * volumetricFlowRate + flowRate
+
+    m^3/s, so a connection is either given as a fraction of the system flow
+    rate, which follows changes of the system flow rate, or as an absolute
+    flow rate, which does not. Streams at different rates, like recycle loops
+    and side draws, use absolute flow rates.
+
+    Args:
+        numComponents:     Number of components
+        numBoundaries:     Number of boundary components
+        feedIDs:           Feed component ID of every connection
+        feedBoundaryIDs:   Feed boundary ID of every connection
+        targetIDs:         Target component ID of every connection
+        targetBoundaryIDs: Target boundary ID of every connection
+        flowFractions:     Flow fraction of every connection
+        flowRates:         Absolute flow rate of every connection in m^3/s
+    """
+    def __init__(self, numComponents, numBoundaries, feedIDs, feedBoundaryIDs, targetIDs,
+        targetBoundaryIDs, flowFractions, flowRates):
+        self.numComponents = numComponents
+        self.numBoundaries = numBoundaries
+        self.feedIDs = np.asarray(feedIDs, dtype=np.int64)
+        self.feedBoundaryIDs = np.asarray(feedBoundaryIDs, dtype=np.int64)
+        self.targetIDs = np.asarray(targetIDs, dtype=np.int64)
+        self.targetBoundaryIDs = np.asarray(targetBoundaryIDs, dtype=np.int64)
+        self.flowFractions = np.asarray(flowFractions, dtype=float)
+        self.flowRates = np.asarray(flowRates, dtype=float)
+        assert(np.all(self.flowFractions >= 0.0) and np.all(self.flowRates >= 0.0))
+
+    @property
+    def numConnections(self):
+        return len(self.feedIDs)
+
+    def getFlowRates(self, volumetricFlowRate):
+        """
+        Gets the volumetric flow rate of every connection
+
+        Args:
+            volumetricFlowRate: System volumetric flow rate in m^3/s
+        """
+        return self.flowFractions * volumetricFlowRate + self.flowRates
+
+    def checkMassBalance(self, volumetricFlowRate):
+        """
+        Checks that the flow into every component equals the flow out of it,
+        for the whole graph at once
+
+        Args:
+            volumetricFlowRate: System volumetric flow rate in m^3/s
+        """
+        checkMassBalance(self.numComponents, self.feedIDs, self.targetIDs,
+            self.getFlowRates(volumetricFlowRate))
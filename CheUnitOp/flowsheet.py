@@ -0,0 +1,338 @@
+"""
+Flowsheet files describe a plant declaratively: its components, boundary
+components, connections, species with their initial concentrations and
+reactions. A flowsheet is loaded straight into a finalized system in one
+vectorized pass with GenericSystem.finalizeFromArrays, without an
+addConnection call per connection.
+
+Three formats are supported, picked by the file extension:
+    .json, .toml: text forms for editing, with one entry per component,
+                  connection, species and reaction
+    .npz:         binary columnar form for fast loading of large plants
+
+The text forms hold a document like
+
+    name = "Brine tanks"
+    volumetricFlowRate = 0.1
+
+    [[components]]
+    name = "Tank A"
+    volume = 100.0
+
+    [[boundaries]]
+    name = "Inlet"
+    type = "inlet"
+
+    [[connections]]
+    feed = "Inlet"
+    target = "Tank A"
+    flowFraction = 1.0
+
+    [[species]]
+    name = "Salt"
+    molarMass = 58.44
+    initialConcentrations = { "Tank A" = 10.0 }
+
+    [[reactions]]
+    reactant = "Salt"
+    rateConstant = 0.01
+
+A connection gives a flowFraction of the system flow rate, an absolute
+flowRate in m^3/s, or both. A reaction without a product removes the
+reactant, and one without components takes place in every component.
+Components are loaded as GenericTanks.
+"""
+import json
+import os
+
+import numpy as np
+
+from CheUnitOp.system import GenericSystem
+from CheUnitOp.component import GenericTank, InletBoundaryCondition, OutletBoundaryCondition
+from CheUnitOp.species import Species
+from CheUnitOp.reaction import FirstOrderReaction
+
+def getFlowsheetArrays(system):
+    """
+    Gets the columnar arrays of a finalized system. Nodes are numbered like
+    in the species table of the system: components, then boundary
+    components. The initial concentrations are the current concentrations,
+    so a solved system is written with the state of its last step.
+
+    Args:
+        system: Finalized GenericSystem object
+    """
+    assert(system.areComponentFinalized and system.areSpeciesFinalized)
+    numComponents = len(system.components)
+    flowGraph = system.flowGraph
+    reactionComponentNames = []
+    reactionComponentCounts = []
+    for reaction in system.reactions:
+        if reaction.componentNames is None:
+            reactionComponentCounts.append(-1)
+        else:
+            reactionComponentCounts.append(len(reaction.componentNames))
+            reactionComponentNames.extend(reaction.componentNames)
+    return {'name': np.array(system.name),
+        'volumetricFlowRate': np.array(system.volumetricFlowRate, dtype=float),
+        'componentNames': np.array([component.name for component in system.components], dtype=str),
+        'volumes': np.array([component.volume for component in system.components], dtype=float),
+        'boundaryNames': np.array([component.name for component in system.boundaryComponents],
+            dtype=str),
+        'isInlet': np.array([isinstance(component, InletBoundaryCondition)
+            for component in system.boundaryComponents], dtype=bool),
+        'feedNodeIDs': np.where(flowGraph.feedIDs >= 0, flowGraph.feedIDs,
+            numComponents + flowGraph.feedBoundaryIDs),
+        'targetNodeIDs': np.where(flowGraph.targetIDs >= 0, flowGraph.targetIDs,
+            numComponents + flowGraph.targetBoundaryIDs),
+        'flowFractions': flowGraph.flowFractions,
+        'flowRates': flowGraph.flowRates,
+        'speciesNames': np.array(system.speciesTable.speciesNames, dtype=str),
+        'molarMasses': system.speciesTable.molarMasses,
+        'initialConcentrations': system.speciesTable.getCurrentConcentrations(),
+        'reactantNames': np.array([reaction.reactantName for reaction in system.reactions],
+            dtype=str),
+        # An empty product name is a reaction without a product
+        'productNames': np.array([reaction.productName or '' for reaction in system.reactions],
+            dtype=str),
+        'rateConstants': np.array([reaction.rateConstant for reaction in system.reactions],
+            dtype=float),
+        'productFractions': np.array([reaction.productFraction
+            for reaction in system.reactions], dtype=float),
+        'reactionComponentNames': np.array(reactionComponentNames, dtype=str),
+        'reactionComponentCounts': np.array(reactionComponentCounts, dtype=np.int64)}
+
+def buildSystem(arrays):
+    """
+    Builds a finalized system from columnar flowsheet arrays
+
+    Args:
+        arrays: Dict of flowsheet arrays, as given by getFlowsheetArrays
+    """
+    system = GenericSystem(str(arrays['name']), float(arrays['volumetricFlowRate']))
+    components = [GenericTank(name, volume) for name, volume in
+        zip(np.asarray(arrays['componentNames']).tolist(), np.asarray(arrays['volumes']).tolist())]
+    boundaries = [InletBoundaryCondition(name) if isInlet else OutletBoundaryCondition(name)
+        for name, isInlet in zip(np.asarray(arrays['boundaryNames']).tolist(),
+        np.asarray(arrays['isInlet']).tolist())]
+    system.addComponents(components + boundaries)
+    system.addSpecies([Species(name, molarMass) for name, molarMass in
+        zip(np.asarray(arrays['speciesNames']).tolist(),
+        np.asarray(arrays['molarMasses']).tolist())])
+
+    reactionComponentNames = np.asarray(arrays['reactionComponentNames']).tolist()
+    reactions = []
+    offset = 0
+    for reactantName, productName, rateConstant, productFraction, count in zip(
+        np.asarray(arrays['reactantNames']).tolist(), np.asarray(arrays['productNames']).tolist(),
+        np.asarray(arrays['rateConstants']).tolist(),
+        np.asarray(arrays['productFractions']).tolist(),
+        np.asarray(arrays['reactionComponentCounts']).tolist()):
+        componentNames = None
+        if count >= 0:
+            componentNames = reactionComponentNames[offset:offset+count]
+            offset += count
+        reactions.append(FirstOrderReaction(reactantName, productName or None, rateConstant,
+            productFraction, componentNames))
+    system.addReactions(reactions)
+
+    system.finalizeFromArrays(arrays['feedNodeIDs'], arrays['targetNodeIDs'],
+        arrays['flowFractions'], arrays['flowRates'], arrays['initialConcentrations'])
+    return system
+
+def saveFlowsheet(system, fileName):
+    """
+    Writes a finalized system to a flowsheet file. The format is picked by
+    the extension, .json, .toml or .npz.
+
+    Args:
+        system:   Finalized GenericSystem object
+        fileName: Name of the file
+    """
+    extension = os.path.splitext(fileName)[1].lower()
+    assert(extension in ('.json', '.toml', '.npz'))
+    arrays = getFlowsheetArrays(system)
+    if extension == '.npz':
+        with open(fileName, 'wb') as file:
+            np.savez(file, **arrays)
+    elif extension == '.json':
+        with open(fileName, 'w', encoding='utf-8') as file:
+            json.dump(_buildDocument(arrays), file, indent = 1, ensure_ascii = False)
+    else:
+        with open(fileName, 'w', encoding='utf-8') as file:
+            _writeToml(_buildDocument(arrays), file)
+
+def loadFlowsheet(fileName):
+    """
+    Loads a flowsheet file into a finalized system. The format is picked by
+    the extension, .json, .toml or .npz. TOML files need Python 3.11 or the
+    tomli package.
+
+    Args:
+        fileName: Name of the file
+    """
+    extension = os.path.splitext(fileName)[1].lower()
+    assert(extension in ('.json', '.toml', '.npz'))
+    if extension == '.npz':
+        with np.load(fileName) as data:
+            arrays = {key: data[key] for key in data.files}
+    elif extension == '.json':
+        with open(fileName, 'r', encoding='utf-8') as file:
+            arrays = _parseDocument(json.load(file))
+    else:
+        try:
+            import tomllib
+        except ImportError:
+            import tomli as tomllib
+        with open(fileName, 'rb') as file:
+            arrays = _parseDocument(tomllib.load(file))
+    return buildSystem(arrays)
+
+def _buildDocument(arrays):
+    """
+    Builds the text document of a flowsheet from its columnar arrays
+
+    Args:
+        arrays: Dict of flowsheet arrays
+    """
+    componentNames = arrays['componentNames'].tolist()
+    boundaryNames = arrays['boundaryNames'].tolist()
+    nodeNames = componentNames + boundaryNames
+    connections = []
+    for feedID, targetID, flowFraction, flowRate in zip(arrays['feedNodeIDs'].tolist(),
+        arrays['targetNodeIDs'].tolist(), arrays['flowFractions'].tolist(),
+        arrays['flowRates'].tolist()):
+        connection = {'feed': nodeNames[feedID], 'target': nodeNames[targetID]}
+        if flowFraction != 0.0 or flowRate == 0.0:
+            connection['flowFraction'] = flowFraction
+        if flowRate != 0.0:
+            connection['flowRate'] = flowRate
+        connections.append(connection)
+
+    # Only the nonzero initial concentrations are written
+    species = []
+    initialCons = arrays['initialConcentrations']
+    for sID, (name, molarMass) in enumerate(zip(arrays['speciesNames'].tolist(),
+        arrays['molarMasses'].tolist())):
+        nodeIDs = np.flatnonzero(initialCons[:, sID]).tolist()
+        species.append({'name': name, 'molarMass': molarMass,
+            'initialConcentrations': {nodeNames[nodeID]: initialCons[nodeID, sID].item()
+            for nodeID in nodeIDs}})
+
+    reactionComponentNames = arrays['reactionComponentNames'].tolist()
+    reactions = []
+    offset = 0
+    for reactantName, productName, rateConstant, productFraction, count in zip(
+        arrays['reactantNames'].tolist(), arrays['productNames'].tolist(),
+        arrays['rateConstants'].tolist(), arrays['productFractions'].tolist(),
+        arrays['reactionComponentCounts'].tolist()):
+        reaction = {'reactant': reactantName}
+        if productName:
+            reaction['product'] = productName
+        reaction['rateConstant'] = rateConstant
+        reaction['productFraction'] = productFraction
+        if count >= 0:
+            reaction['components'] = reactionComponentNames[offset:offset+count]
+            offset += count
+        reactions.append(reaction)
+
+    return {'name': str(arrays['name']),
+        'volumetricFlowRate': float(arrays['volumetricFlowRate']),
+        'components': [{'name': name, 'volume': volume}
+            for name, volume in zip(componentNames, arrays['volumes'].tolist())],
+        'boundaries': [{'name': name, 'type': 'inlet' if isInlet else 'outlet'}
+            for name, isInlet in zip(boundaryNames, arrays['isInlet'].tolist())],
+        'connections': connections,
+        'species': species,
+        'reactions': reactions}
+
+def _parseDocument(document):
+    """
+    Converts the text document of a flowsheet to columnar arrays
+
+    Args:
+        document: Dict read from a JSON or TOML file
+    """
+    components = document.get('components', [])
+    boundaries = document.get('boundaries', [])
+    connections = document.get('connections', [])
+    species = document.get('species', [])
+    reactions = document.get('reactions', [])
+    for boundary in boundaries:
+        assert(boundary['type'] in ('inlet', 'outlet'))
+    for connection in connections:
+        assert('flowFraction' in connection or 'flowRate' in connection)
+    nodeNames = ([component['name'] for component in components] +
+        [boundary['name'] for boundary in boundaries])
+    nodeIndex = {name: nodeID for nodeID, name in enumerate(nodeNames)}
+    assert(len(nodeIndex) == len(nodeNames))
+
+    initialCons = np.zeros((len(nodeNames), len(species)))
+    for sID, spec in enumerate(species):
+        cons = spec.get('initialConcentrations', {})
+        initialCons[[nodeIndex[name] for name in cons], sID] = list(cons.values())
+
+    reactionComponentNames = []
+    reactionComponentCounts = []
+    for reaction in reactions:
+        if reaction.get('components') is None:
+            reactionComponentCounts.append(-1)
+        else:
+            reactionComponentCounts.append(len(reaction['components']))
+            reactionComponentNames.extend(reaction['components'])
+
+    return {'name': np.array(document.get('name', '')),
+        'volumetricFlowRate': np.array(document['volumetricFlowRate'], dtype=float),
+        'componentNames': np.array([component['name'] for component in components], dtype=str),
+        'volumes': np.array([component['volume'] for component in components], dtype=float),
+        'boundaryNames': np.array([boundary['name'] for boundary in boundaries], dtype=str),
+        'isInlet': np.array([boundary['type'] == 'inlet' for boundary in boundaries],
+            dtype=bool),
+        'feedNodeIDs': np.array([nodeIndex[connection['feed']] for connection in connections],
+            dtype=np.int64),
+        'targetNodeIDs': np.array([nodeIndex[connection['target']]
+            for connection in connections], dtype=np.int64),
+        'flowFractions': np.array([connection.get('flowFraction', 0.0)
+            for connection in connections], dtype=float),
+        'flowRates': np.array([connection.get('flowRate', 0.0) for connection in connections],
+            dtype=float),
+        'speciesNames': np.array([spec['name'] for spec in species], dtype=str),
+        'molarMasses': np.array([spec.get('molarMass', 0.0) for spec in species], dtype=float),
+        'initialConcentrations': initialCons,
+        'reactantNames': np.array([reaction['reactant'] for reaction in reactions], dtype=str),
+        'productNames': np.array([reaction.get('product') or '' for reaction in reactions],
+            dtype=str),
+        'rateConstants': np.array([reaction['rateConstant'] for reaction in reactions],
+            dtype=float),
+        'productFractions': np.array([reaction.get('productFraction', 1.0)
+            for reaction in reactions], dtype=float),
+        'reactionComponentNames': np.array(reactionComponentNames, dtype=str),
+        'reactionComponentCounts': np.array(reactionComponentCounts, dtype=np.int64)}
+
+def _writeToml(document, file):
+    """
+    Writes a flowsheet document as TOML. The standard library can only read
+    TOML, and a flowsheet only needs strings, floats, lists of strings and
+    tables of floats, so the writer is kept to those.
+
+    Args:
+        document: Flowsheet document
+        file:     Text file object
+    """
+    def formatValue(value):
+        if isinstance(value, str):
+            return json.dumps(value, ensure_ascii = False)
+        if isinstance(value, list):
+            return "[" + ", ".join(formatValue(item) for item in value) + "]"
+        if isinstance(value, dict):
+            return "{ " + ", ".join(formatValue(key) + " = " + formatValue(item)
+                for key, item in value.items()) + " }"
+        return repr(float(value))
+
+    file.write("name = " + formatValue(document['name']) + "\n")
+    file.write("volumetricFlowRate = " + formatValue(document['volumetricFlowRate']) + "\n")
+    for tableName in ('components', 'boundaries', 'connections', 'species', 'reactions'):
+        for entry in document[tableName]:
+            file.write("\n[[" + tableName + "]]\n")
+            for key, value in entry.items():
+                file.write(key + " = " + formatValue(value) + "\n")
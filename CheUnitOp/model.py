@@ -0,0 +1,825 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from scipy.sparse.linalg import splu, gmres
+
+from CheUnitOp.cache import PropagatorCache, PropagatorLadder, matrixKey
+from CheUnitOp.solver import ExpmSolver, EigenSolver
+from CheUnitOp.assembly import (buildFlowMatrix, buildFeedMatrix, augmentMatrix,
+    expandSpecies, checkMassBalance, buildReactionMatrix, getClosedClasses)
+from CheUnitOp.storage import MemoryStorage, getSavedSteps
+from CheUnitOp.ensemble import propagateGroup
+
+def _frozenArray(values, dtype):
+    """
+    Copies values into a read only array
+
+    Args:
+        values: Values of the array
+        dtype:  Data type of the array
+    """
+    array = np.array(values, dtype=dtype)
+    array.setflags(write = False)
+    return array
+
+class CompiledModel:
+    """
+    Compact, immutable form of a finalized system. It holds only index arrays,
+    parameter arrays, the sparse transition matrix, the source vector and
+    name to index maps, so it pickles cheaply, can be sent to worker processes
+    and can be saved to and loaded from disk without rebuilding the component
+    and species objects. Models are built with GenericSystem.compile or
+    CompiledModel.load. Every solve method returns new arrays and leaves the
+    model unchanged.
+
+    Connections are stored as arrays with one entry per connection, like in
+    the system FlowGraph. A feed or target that is a boundary component has an
+    ID of -1 and its boundary ID in feedBoundaryIDs or targetBoundaryIDs,
+    otherwise the boundary ID is -1. A connection carries its flow fraction
+    times the system flow rate plus its absolute flow rate.
+
+    Args:
+        name:                   Name of the system
+        componentNames:         Names of the components, indexed by ID
+        boundaryNames:          Names of the boundary components, indexed by ID
+        speciesNames:           Names of the species, indexed by ID
+        volumes:                Component volumes in m^3
+        volumetricFlowRate:     System volumetric flow rate in m^3/s
+        feedIDs:                Feed component ID of every connection
+        feedBoundaryIDs:        Feed boundary ID of every connection
+        targetIDs:              Target component ID of every connection
+        targetBoundaryIDs:      Target boundary ID of every connection
+        flowFractions:          Flow fraction of every connection
+        initialConcentrations:  (components x species) initial concentrations
+        boundaryConcentrations: (boundaries x species) boundary concentrations
+        reactantIDs:            Reactant species ID of every reaction term
+        productIDs:             Product species ID of every reaction term
+        rateConstants:          Rate constant of every reaction term in 1/s
+        productFractions:       Product fraction of every reaction term
+        reactionComponentIDs:   Component ID of every reaction term, -1 for all
+        flowRates:              Absolute flow rate of every connection in m^3/s,
+                                None for connections given by fractions only
+    """
+    def __init__(self, name, componentNames, boundaryNames, speciesNames, volumes,
+        volumetricFlowRate, feedIDs, feedBoundaryIDs, targetIDs, targetBoundaryIDs,
+        flowFractions, initialConcentrations, boundaryConcentrations, reactantIDs = (),
+        productIDs = (), rateConstants = (), productFractions = (), reactionComponentIDs = (),
+        flowRates = None):
+        assert(isinstance(name, str))
+        assert(volumetricFlowRate >= 0.0)
+        self.name = name
+        self.componentNames = tuple(componentNames)
+        self.boundaryNames = tuple(boundaryNames)
+        self.speciesNames = tuple(speciesNames)
+        self.volumetricFlowRate = float(volumetricFlowRate)
+        self.volumes = _frozenArray(volumes, float)
+        self.feedIDs = _frozenArray(feedIDs, np.int64)
+        self.feedBoundaryIDs = _frozenArray(feedBoundaryIDs, np.int64)
+        self.targetIDs = _frozenArray(targetIDs, np.int64)
+        self.targetBoundaryIDs = _frozenArray(targetBoundaryIDs, np.int64)
+        self.flowFractions = _frozenArray(flowFractions, float)
+        if flowRates is None:
+            flowRates = np.zeros(len(self.flowFractions))
+        self.flowRates = _frozenArray(flowRates, float)
+        self.initialConcentrations = _frozenArray(initialConcentrations, float).reshape(
+            self.numComponents, self.numSpecies)
+        self.boundaryConcentrations = _frozenArray(boundaryConcentrations, float).reshape(
+            self.numBoundaries, self.numSpecies)
+        self.reactantIDs = _frozenArray(reactantIDs, np.int64)
+        self.productIDs = _frozenArray(productIDs, np.int64)
+        self.rateConstants = _frozenArray(rateConstants, float)
+        self.productFractions = _frozenArray(productFractions, float)
+        self.reactionComponentIDs = _frozenArray(reactionComponentIDs, np.int64)
+        assert(len(self.volumes) == self.numComponents)
+
+        self.componentIndex = {name: i for i, name in enumerate(self.componentNames)}
+        self.boundaryIndex = {name: i for i, name in enumerate(self.boundaryNames)}
+        self.speciesIndex = {name: i for i, name in enumerate(self.speciesNames)}
+        self.__connectionIndex = None
+        self.F, self.G = self.buildFlowMatrix()
+        self.A, self.s = self.__expandFlowMatrix(self.F, self.G, self.boundaryConcentrations)
+
+    @property
+    def numComponents(self):
+        return len(self.componentNames)
+
+    @property
+    def numBoundaries(self):
+        return len(self.boundaryNames)
+
+    @property
+    def numSpecies(self):
+        return len(self.speciesNames)
+
+    def isSpeciesDecoupled(self):
+        """
+        Checks if the species evolve independently of one another. Without
+        reactions species only interact through flow, which is the same for
+        every species, so the transition matrix is block structured as
+        F kron I_species.
+        """
+        return len(self.reactantIDs) == 0
+
+    def getConnectionIndices(self, feedName, targetName):
+        """
+        Gets the indices of the connections from one component to another
+
+        Args:
+            feedName:   Name of the feed component
+            targetName: Name of the target component
+        """
+        if self.__connectionIndex is None:
+            # The index is only published once it is complete, so threads
+            # sharing the model never see a partial index
+            connectionIndex = {}
+            for i in range(len(self.flowFractions)):
+                key = (self.__getConnectionEndName(self.feedIDs[i], self.feedBoundaryIDs[i]),
+                    self.__getConnectionEndName(self.targetIDs[i], self.targetBoundaryIDs[i]))
+                connectionIndex.setdefault(key, []).append(i)
+            self.__connectionIndex = connectionIndex
+        return self.__connectionIndex[(feedName, targetName)]
+
+    def buildFlowMatrix(self, configuration = None):
+        """
+        Builds the component level flow matrix (F) and the boundary feed matrix
+        (G) from the connection arrays.
+
+        Args:
+            configuration: Parameter overrides of a schedule or variant, None
+                           uses the values stored in the model
+        """
+        volumes, volumetricFlowRate, flowFractions, absoluteFlowRates = (
+            self.__getFlowParameters(configuration))
+        flowRates = volumetricFlowRate * flowFractions + absoluteFlowRates
+        F = buildFlowMatrix(volumes, self.feedIDs, self.targetIDs, flowRates)
+        G = buildFeedMatrix(volumes, self.numBoundaries, self.feedBoundaryIDs,
+            self.targetIDs, flowRates)
+        return F, G
+
+    def withVariant(self, variant):
+        """
+        Builds a new model with the parameters of a variant. This model is
+        left unchanged, so a model shared between threads or requests can be
+        varied per request.
+
+        Args:
+            variant: Variant object
+        """
+        volumes, volumetricFlowRate, flowFractions, flowRates = self.__getFlowParameters(
+            variant.getConfiguration())
+        return CompiledModel(self.name, self.componentNames, self.boundaryNames,
+            self.speciesNames, volumes, volumetricFlowRate, self.feedIDs, self.feedBoundaryIDs,
+            self.targetIDs, self.targetBoundaryIDs, flowFractions,
+            self.getVariantInitialConcentrations(variant),
+            self.buildBoundaryConcentrations(variant.getConfiguration()), self.reactantIDs,
+            self.productIDs, self.rateConstants, self.productFractions,
+            self.reactionComponentIDs, flowRates)
+
+    def getVariantInitialConcentrations(self, variant):
+        """
+        Gets the (components x species) initial concentrations of a variant
+
+        Args:
+            variant: Variant object
+        """
+        initialCon = self.initialConcentrations.copy()
+        for (componentName, speciesName), con in variant.initialConcentrations.items():
+            initialCon[self.componentIndex[componentName], self.speciesIndex[speciesName]] = con
+        return initialCon
+
+    def buildBoundaryConcentrations(self, configuration = None):
+        """
+        Builds the (boundary components x species) array of boundary
+        concentrations
+
+        Args:
+            configuration: Parameter overrides of a schedule or variant, None
+                           uses the values stored in the model
+        """
+        if configuration is None or not configuration.get('boundaryConcentrations'):
+            return self.boundaryConcentrations
+        boundaryCons = self.boundaryConcentrations.copy()
+        for (componentName, speciesName), con in configuration['boundaryConcentrations'].items():
+            boundaryCons[self.boundaryIndex[componentName], self.speciesIndex[speciesName]] = con
+        return boundaryCons
+
+    def buildReactionMatrix(self):
+        """
+        Builds the sparse matrix of first order reaction terms that is added to
+        the flow terms of the transition matrix
+        """
+        return buildReactionMatrix(self.numComponents, self.numSpecies, self.reactantIDs,
+            self.productIDs, self.rateConstants, self.productFractions,
+            self.reactionComponentIDs)
+
+    def buildTransitionMatrix(self, configuration = None):
+        """
+        Builds the transition matrix (A) and the source vector (s) for
+        dy / dt = A * y + s. The component level flow matrix is expanded to
+        every species and the reaction terms are added, without a dense
+        intermediate. The source comes from the boundary concentrations.
+
+        Args:
+            configuration: Parameter overrides of a schedule or variant, None
+                           uses the values stored in the model
+        """
+        if configuration is None:
+            return self.A, self.s
+        F, G = self.buildFlowMatrix(configuration)
+        return self.__expandFlowMatrix(F, G, self.buildBoundaryConcentrations(configuration))
+
+    def buildStepOperator(self, configuration = None):
+        """
+        Builds the pieces of the affine system dy / dt = A * y + S * u for one
+        configuration. Returns A, the input matrix S, the constant inputs u
+        and whether the source S * u is nonzero. Species decoupled models get
+        the component level system, where every species is a column of the
+        solution and the boundary concentrations are the inputs.
+
+        Args:
+            configuration: Parameter overrides of a schedule or variant, None
+                           uses the values stored in the model
+        """
+        if self.isSpeciesDecoupled():
+            if configuration is None:
+                A, inputMatrix = self.F, self.G
+            else:
+                A, inputMatrix = self.buildFlowMatrix(configuration)
+            inputs = self.buildBoundaryConcentrations(configuration)
+            hasSource = np.any(inputMatrix @ inputs)
+        else:
+            A, s = self.buildTransitionMatrix(configuration)
+            inputMatrix = s.reshape(-1, 1)
+            inputs = np.ones((1, 1))
+            hasSource = np.any(s)
+        return A, inputMatrix, inputs, hasSource
+
+    def getInitialCondition(self, initialConcentrations = None):
+        """
+        Gets the initial solution in the layout used by the solve, i.e.
+        (components x species) for species decoupled models and a (DOFs x 1)
+        column otherwise.
+
+        Args:
+            initialConcentrations: (components x species) array replacing the
+                                   initial concentrations of the model
+        """
+        if initialConcentrations is None:
+            initialConcentrations = self.initialConcentrations
+        b = np.array(initialConcentrations, dtype=float).reshape(self.numComponents,
+            self.numSpecies)
+        return b if self.isSpeciesDecoupled() else b.reshape(-1, 1)
+
+    def solve(self, tEnd, numSteps, solver = None, propagatorCache = None, storage = None,
+        schedule = None, steadyStateTolerance = None, initialConcentrations = None,
+        stats = None):
+        """
+        Solves the model with uniform steps. Returns the times of the stored
+        steps and the stored solution array (stored steps, components, species).
+
+        Args:
+            tEnd:                  End time of the simulation
+            numSteps:              Number of steps to take
+            solver:                Solver object, None uses an ExpmSolver
+            propagatorCache:       Cache the propagators are fetched from, None
+                                   uses a cache local to this solve
+            storage:               Storage object, None keeps every step in a
+                                   new MemoryStorage
+            schedule:              Piecewise constant operating schedule
+            steadyStateTolerance:  If given, the solve stops early once the
+                                   largest change over one step is below this
+                                   fraction of the largest concentration. Only
+                                   checked after the last schedule breakpoint.
+            initialConcentrations: (components x species) array replacing the
+                                   initial concentrations of the model
+            stats:                 Stats object the phases and steps are
+                                   recorded in, None records nothing. The
+                                   propagator builds are recorded as the
+                                   buildPropagator phase, nested in
+                                   timeStepping.
+        """
+        if solver is None:
+            solver = ExpmSolver()
+        if propagatorCache is None:
+            propagatorCache = PropagatorCache()
+        if storage is None:
+            storage = MemoryStorage()
+        dt = tEnd/float(numSteps)
+        numComponents = self.numComponents
+        numSpecies = self.numSpecies
+        # Species decoupled models have A = F kron I_species, so the small
+        # component level propagator exp(F * dt) is applied to every species
+        # at once as a matrix product on the (components x species) solution
+        if stats is not None:
+            stats.startPhase('initialCondition')
+        sol = self.getInitialCondition(initialConcentrations)
+        numStateRows = sol.shape[0]
+        initialSol = sol.reshape(numComponents, numSpecies).copy()
+        if stats is not None:
+            stats.endPhase('initialCondition')
+            stats.startPhase('buildStepOperator')
+
+        if schedule is None:
+            breakpoints = []
+            configurations = [None]
+        else:
+            breakpoints = [t for t in schedule.getBreakpoints() if t < tEnd]
+            configurations = schedule.getConfigurations()[:len(breakpoints)+1]
+        operators = [self.buildStepOperator(configuration) for configuration in configurations]
+        # Constant feeds are carried as extra states with a zero time
+        # derivative. The exponential of the augmented matrix then integrates
+        # dy / dt = A * y + s exactly at the same per step cost
+        isAugmented = any(hasSource for A, inputMatrix, inputs, hasSource in operators)
+        matrices = []
+        for A, inputMatrix, inputs, hasSource in operators:
+            matrices.append(augmentMatrix(A, inputMatrix) if isAugmented else A)
+        if isAugmented:
+            sol = np.vstack((sol, operators[0][2]))
+        if stats is not None:
+            stats.endPhase('buildStepOperator', matrices[0])
+            stats.startPhase('timeStepping')
+            cacheMisses = propagatorCache.misses
+
+        # The propagator is only rebuilt at schedule breakpoints, and fetched
+        # from the cache whenever a (matrix, dt) pair has been seen before
+        configurationIndex = 0
+        A = matrices[0]
+        propagator = propagatorCache.getPropagator(A, dt, solver, stats)
+        tolerance = 1e-12 * tEnd
+        # The history is handed to the storage with the DOF ordering of the
+        # solution, (step, component, species)
+        savedSteps = storage.begin(numSteps, (numComponents, numSpecies))
+        storage.write(initialSol)
+        nextSave = 1
+        isSteady = False
+        for step in range(1, numSteps+1):
+            if steadyStateTolerance is not None:
+                previousSol = sol[:numStateRows].copy()
+            t = (step - 1) * dt
+            tStepEnd = step * dt
+            # Breakpoints inside the step split it into partial steps
+            while (configurationIndex < len(breakpoints) and
+                breakpoints[configurationIndex] < tStepEnd - tolerance):
+                breakpoint = breakpoints[configurationIndex]
+                if breakpoint > t + tolerance:
+                    sol = propagatorCache.getPropagator(A, breakpoint - t, solver, stats).apply(sol)
+                    t = breakpoint
+                configurationIndex += 1
+                A = matrices[configurationIndex]
+                if isAugmented:
+                    sol[numStateRows:] = operators[configurationIndex][2]
+                propagator = propagatorCache.getPropagator(A, dt, solver, stats)
+            if t == (step - 1) * dt:
+                sol = propagator.apply(sol)
+            else:
+                sol = propagatorCache.getPropagator(A, tStepEnd - t, solver, stats).apply(sol)
+            if steadyStateTolerance is not None and configurationIndex == len(breakpoints):
+                change = np.max(np.abs(sol[:numStateRows] - previousSol))
+                isSteady = change <= steadyStateTolerance * np.max(np.abs(sol[:numStateRows]))
+            if step == savedSteps[nextSave] or isSteady:
+                storage.write(sol[:numStateRows].reshape(numComponents, numSpecies))
+                nextSave += 1
+            if stats is not None:
+                stats.callStepCallbacks(step, tStepEnd,
+                    sol[:numStateRows].reshape(numComponents, numSpecies))
+            if isSteady:
+                savedSteps = np.append(savedSteps[:nextSave-1], step)
+                break
+        if stats is not None:
+            stats.endPhase('timeStepping')
+            stats.count('steps', step)
+            stats.count('propagatorCacheMisses', propagatorCache.misses - cacheMisses)
+            stats.startPhase('storeSolution')
+        solutionArray = storage.end()
+        if stats is not None:
+            stats.endPhase('storeSolution')
+        return savedSteps * dt, solutionArray
+
+    def solveAdaptive(self, tEnd, tolerance = 1e-4, minStep = None, solver = None,
+        propagatorCache = None, initialConcentrations = None, stats = None):
+        """
+        Solves the model with step sizes chosen from the requested output
+        accuracy. Every step is exact, so the error that is controlled is the
+        error of linearly interpolating the solution between the stored
+        steps, which is what plots and exported tables show. Each step of
+        size h is checked against a half step from the same start,
+
+            error = max|y(t + h/2) - (y(t) + y(t + h)) / 2| / max|y|
+
+        A step with an error above tolerance is retried with half the size,
+        and the step size is doubled when the error is below an eighth of the
+        tolerance. Fast transients in small tanks thus get small steps and
+        the slow tail gets large ones. Steps are powers of two times minStep,
+        so a small set of propagators is reused, and the larger ones are
+        built by squaring. Both the half step and the full step are stored.
+        Returns the stored times, the stored solution array (stored steps,
+        components, species) and the sizes of the accepted steps. Steps at
+        minStep are accepted even if the tolerance is not met. The cost of the
+        KrylovSolver grows with the step size times the fastest rate, so stiff
+        models should use a solver that builds a matrix propagator.
+
+        Args:
+            tEnd:                  End time of the simulation
+            tolerance:             Largest interpolation error relative to
+                                   the largest concentration
+            minStep:               Smallest step size, rounded down to tEnd
+                                   over a power of two. Defaults to an eighth
+                                   of the first step, sqrt(tolerance) over
+                                   the fastest rate of the model
+            solver:                Solver object, None uses an ExpmSolver
+            propagatorCache:       Cache the propagators are fetched from, None
+                                   uses a cache local to this solve
+            initialConcentrations: (components x species) array replacing the
+                                   initial concentrations of the model
+            stats:                 Stats object the phases and steps are
+                                   recorded in, None records nothing
+        """
+        assert(tEnd > 0.0)
+        assert(tolerance > 0.0)
+        if solver is None:
+            solver = ExpmSolver()
+        if propagatorCache is None:
+            propagatorCache = PropagatorCache()
+        numComponents = self.numComponents
+        numSpecies = self.numSpecies
+        sol = self.getInitialCondition(initialConcentrations)
+        numStateRows = sol.shape[0]
+        A, inputMatrix, inputs, hasSource = self.buildStepOperator()
+        if hasSource:
+            A = augmentMatrix(A, inputMatrix)
+            sol = np.vstack((sol, inputs))
+
+        # The first step resolves the fastest rate of the model
+        fastestRate = np.max(np.abs(A.diagonal()))
+        firstStep = np.sqrt(tolerance) / fastestRate if fastestRate > 0.0 else tEnd
+        if minStep is None:
+            minStep = min(tEnd, firstStep / 8.0)
+        assert(0.0 < minStep <= tEnd)
+        # Times are counted in integer units of the base step, so the steps
+        # land exactly on tEnd
+        numLevels = int(np.ceil(np.log2(tEnd / minStep)))
+        numUnits = 2**numLevels
+        ladder = PropagatorLadder(A, tEnd / numUnits, solver, propagatorCache,
+            stats = stats)
+        level = int(np.clip(np.floor(np.log2(firstStep / ladder.baseStep)), 0, numLevels))
+
+        if stats is not None:
+            stats.startPhase('adaptiveStepping')
+        times = [0.0]
+        solutions = [sol[:numStateRows].reshape(numComponents, numSpecies).copy()]
+        stepSizes = []
+        numRejected = 0
+        numUnresolved = 0
+        position = 0
+        while position < numUnits:
+            # Steps never pass tEnd and only grow from aligned positions
+            while position % 2**level != 0 or position + 2**level > numUnits:
+                level -= 1
+            halfSol = ladder.getPropagator(level - 1).apply(sol) if level > 0 else None
+            fullSol = ladder.getPropagator(level).apply(sol)
+            if level > 0:
+                scale = max(np.max(np.abs(sol[:numStateRows])),
+                    np.max(np.abs(fullSol[:numStateRows])), np.finfo(float).tiny)
+                error = np.max(np.abs(halfSol[:numStateRows] -
+                    0.5 * (sol[:numStateRows] + fullSol[:numStateRows]))) / scale
+                if error > tolerance:
+                    level -= 1
+                    numRejected += 1
+                    continue
+                times.append((position + 2**(level - 1)) * ladder.baseStep)
+                solutions.append(halfSol[:numStateRows].reshape(numComponents, numSpecies))
+            else:
+                numUnresolved += 1
+            position += 2**level
+            times.append(position * ladder.baseStep)
+            solutions.append(fullSol[:numStateRows].reshape(numComponents, numSpecies))
+            stepSizes.append(ladder.getStep(level))
+            sol = fullSol
+            if stats is not None:
+                stats.callStepCallbacks(len(stepSizes), times[-1], solutions[-1])
+            if level == 0 or error <= tolerance / 8.0:
+                level += 1
+        if stats is not None:
+            stats.endPhase('adaptiveStepping')
+            stats.count('steps', len(stepSizes))
+            stats.count('rejectedSteps', numRejected)
+            stats.count('unresolvedSteps', numUnresolved)
+            stats.count('ladderLevels', len(ladder))
+        return np.array(times), np.array(solutions), np.array(stepSizes)
+
+    def solveSteadyState(self, method = 'direct', tolerance = 1e-10, initialConcentrations = None):
+        """
+        Solves directly for the long time solution of dy / dt = A * y + s,
+        without time stepping. Species decoupled models solve the small
+        component level system for all species at once. Returns a
+        (components x species) array.
+
+        A is singular when the model has closed classes, like recycle loops
+        without an outlet or tanks without connections, see
+        getClosedClasses. Everything else is transient and solves
+        A_TT * y_T = -s_T. A closed class keeps all mass that ends up in it,
+        its initial inventory plus what drains into it from the transient
+        DOFs, spread over the class like the null vector of its block of A.
+        A constant feed that reaches a closed class has no steady state.
+
+        Args:
+            method:                'direct' for a sparse LU factorization or
+                                   'iterative' for GMRES
+            tolerance:             Relative tolerance of the iterative solve
+            initialConcentrations: (components x species) array replacing the
+                                   initial concentrations of the model, only
+                                   used by closed classes
+        """
+        assert(method in ('direct', 'iterative'))
+        A, inputMatrix, inputs, hasSource = self.buildStepOperator()
+        A = A.tocsr()
+        rhs = -np.asarray(inputMatrix @ inputs).reshape(A.shape[0], -1)
+        weights = self.volumes if self.isSpeciesDecoupled() else np.repeat(self.volumes,
+            self.numSpecies)
+        closedClasses = getClosedClasses(A, weights)
+        isTransient = np.ones(A.shape[0], dtype=bool)
+        for closedClass in closedClasses:
+            isTransient[closedClass] = False
+        transient = np.flatnonzero(isTransient)
+        ATT = A[transient][:, transient]
+
+        sol = np.zeros_like(rhs)
+        if len(transient) > 0:
+            sol[transient] = self.__solveLinear(ATT, rhs[transient], method, tolerance)
+        if closedClasses:
+            y0 = self.getInitialCondition(initialConcentrations).reshape(A.shape[0], -1)
+            # Each class ends up in a multiple of the right null vector r of
+            # its block. The left null vector l with l^T A = 0 and l^T r = 1
+            # gives the multiple l^T y0, and on the transient DOFs l is the
+            # fraction of their mass that drains into the class.
+            rightNullVectors = []
+            leftNullVectors = np.zeros((A.shape[0], len(closedClasses)))
+            for classIndex, closedClass in enumerate(closedClasses):
+                ACC = A[closedClass][:, closedClass]
+                rightVector = self.__getNullVector(ACC)
+                leftVector = self.__getNullVector(ACC.T.tocsr())
+                rightNullVectors.append(rightVector)
+                leftNullVectors[closedClass, classIndex] = leftVector / (leftVector @ rightVector)
+            if len(transient) > 0:
+                leftNullVectors[transient] = self.__solveLinear(ATT.T.tocsr(),
+                    -(A[:, transient].T @ leftNullVectors), method, tolerance)
+            # Mass fed into a closed class grows without bound
+            classFeeds = leftNullVectors.T @ rhs
+            assert np.all(np.abs(classFeeds) <= 1e-10 * (np.abs(leftNullVectors).T @
+                np.abs(rhs))), ("No steady state: a constant feed reaches a recycle loop "
+                "or tank without an outlet")
+            for classIndex, closedClass in enumerate(closedClasses):
+                sol[closedClass] = np.outer(rightNullVectors[classIndex],
+                    leftNullVectors[:, classIndex] @ y0)
+        return sol.reshape(self.numComponents, self.numSpecies)
+
+    def solveAtTimes(self, times, solver = None, initialConcentrations = None):
+        """
+        Solves the model at an arbitrary array of output times from one
+        factorization of the transition matrix and returns the solution array
+        (times, components, species).
+
+        Args:
+            times:                 Array of output times in seconds, all >= 0
+            solver:                EigenSolver object, None uses a default one
+            initialConcentrations: (components x species) array replacing the
+                                   initial concentrations of the model
+        """
+        times = np.asarray(times, dtype=float)
+        assert(np.all(times >= 0.0))
+        if solver is None:
+            solver = EigenSolver()
+        A, inputMatrix, inputs, hasSource = self.buildStepOperator()
+        sol = self.getInitialCondition(initialConcentrations)
+        numStateRows = sol.shape[0]
+        if hasSource:
+            A = augmentMatrix(A, inputMatrix)
+            sol = np.vstack((sol, inputs))
+        solutions = solver.evaluate(A, sol, times)
+        return solutions[:, :numStateRows].reshape(len(times), self.numComponents,
+            self.numSpecies)
+
+    def solveEnsemble(self, variants, tEnd, numSteps, saveEvery = 1, maxWorkers = None,
+        solver = None, propagatorCache = None):
+        """
+        Solves many variants of the model and returns the times of the stored
+        steps and one array of shape (variants, stored steps, components,
+        species). Variants with identical transition matrices are advanced
+        together as one matrix product on a block of initial conditions. The
+        remaining groups are spread over a process pool when maxWorkers is
+        larger than one.
+
+        Args:
+            variants:        List of variant objects
+            tEnd:            End time of the simulation
+            numSteps:        Number of steps to take
+            saveEvery:       Only every saveEvery-th step is stored
+            maxWorkers:      Number of worker processes, None solves in this
+                             process
+            solver:          Solver object, None uses an ExpmSolver
+            propagatorCache: Cache used when solving in this process
+        """
+        if solver is None:
+            solver = ExpmSolver()
+        dt = tEnd/float(numSteps)
+        numComponents = self.numComponents
+        numSpecies = self.numSpecies
+        savedSteps = getSavedSteps(numSteps, saveEvery)
+        isSpeciesDecoupled = self.isSpeciesDecoupled()
+
+        # Groups the variants by their (augmented) transition matrix
+        groups = {}
+        for variantIndex, variant in enumerate(variants):
+            A, inputMatrix, inputs, hasSource = self.buildStepOperator(
+                variant.getConfiguration())
+            sol = self.getInitialCondition(self.getVariantInitialConcentrations(variant))
+            if hasSource:
+                A = augmentMatrix(A, inputMatrix)
+                sol = np.vstack((sol, inputs))
+            key = matrixKey(A)
+            if key not in groups:
+                groups[key] = (A, [], [])
+            groups[key][1].append(variantIndex)
+            groups[key][2].append(sol)
+
+        tasks = [(A, np.hstack(sols)) for A, variantIndices, sols in groups.values()]
+        if maxWorkers is not None and maxWorkers > 1 and len(tasks) > 1:
+            with ProcessPoolExecutor(max_workers = maxWorkers) as executor:
+                futures = [executor.submit(propagateGroup, A, sol, dt, savedSteps, solver)
+                    for A, sol in tasks]
+                results = [future.result() for future in futures]
+        else:
+            results = [propagateGroup(A, sol, dt, savedSteps, solver, propagatorCache)
+                for A, sol in tasks]
+
+        solutions = np.empty((len(variants), len(savedSteps), numComponents, numSpecies))
+        for (A, variantIndices, sols), result in zip(groups.values(), results):
+            numVariants = len(variantIndices)
+            if isSpeciesDecoupled:
+                # Columns are ordered by variant, then species
+                result = result[:, :numComponents, :].reshape(len(savedSteps),
+                    numComponents, numVariants, numSpecies).transpose(2, 0, 1, 3)
+            else:
+                result = result[:, :numComponents*numSpecies, :].transpose(2, 0, 1).reshape(
+                    numVariants, len(savedSteps), numComponents, numSpecies)
+            solutions[variantIndices] = result
+        return savedSteps * dt, solutions
+
+    def save(self, fileName):
+        """
+        Saves the model arrays to a .npz file. The sparse matrices are rebuilt
+        from the arrays when the model is loaded.
+
+        Args:
+            fileName: Name of the file
+        """
+        np.savez(fileName, name = np.array(self.name),
+            componentNames = np.array(self.componentNames, dtype=str),
+            boundaryNames = np.array(self.boundaryNames, dtype=str),
+            speciesNames = np.array(self.speciesNames, dtype=str),
+            volumes = self.volumes, volumetricFlowRate = np.array(self.volumetricFlowRate),
+            feedIDs = self.feedIDs, feedBoundaryIDs = self.feedBoundaryIDs,
+            targetIDs = self.targetIDs, targetBoundaryIDs = self.targetBoundaryIDs,
+            flowFractions = self.flowFractions, flowRates = self.flowRates,
+            initialConcentrations = self.initialConcentrations,
+            boundaryConcentrations = self.boundaryConcentrations,
+            reactantIDs = self.reactantIDs, productIDs = self.productIDs,
+            rateConstants = self.rateConstants, productFractions = self.productFractions,
+            reactionComponentIDs = self.reactionComponentIDs)
+
+    @classmethod
+    def load(cls, fileName):
+        """
+        Loads a model saved with save
+
+        Args:
+            fileName: Name of the .npz file
+        """
+        with np.load(fileName) as data:
+            return cls(str(data['name']), data['componentNames'].tolist(),
+                data['boundaryNames'].tolist(), data['speciesNames'].tolist(),
+                data['volumes'], float(data['volumetricFlowRate']), data['feedIDs'],
+                data['feedBoundaryIDs'], data['targetIDs'], data['targetBoundaryIDs'],
+                data['flowFractions'], data['initialConcentrations'],
+                data['boundaryConcentrations'], data['reactantIDs'], data['productIDs'],
+                data['rateConstants'], data['productFractions'],
+                data['reactionComponentIDs'], data['flowRates'])
+
+    @staticmethod
+    def __solveLinear(M, rhs, method, tolerance):
+        """
+        Solves M * x = rhs for every column of rhs and checks the residual,
+        since GMRES can stop early without reporting it
+
+        Args:
+            M:         Sparse nonsingular matrix
+            rhs:       (rows x columns) right hand side
+            method:    'direct' for a sparse LU factorization or 'iterative'
+                       for GMRES
+            tolerance: Relative tolerance of the iterative solve
+        """
+        if method == 'direct':
+            sol = splu(M.tocsc()).solve(rhs)
+        else:
+            sol = np.empty_like(rhs)
+            for column in range(rhs.shape[1]):
+                sol[:, column], info = gmres(M, rhs[:, column], rtol = tolerance)
+                assert info == 0, "GMRES did not converge"
+        residual = np.linalg.norm(M @ sol - rhs, axis = 0)
+        scale = np.linalg.norm(rhs, axis = 0) + abs(M).max() * np.linalg.norm(sol, axis = 0)
+        allowedResidual = (1e-8 if method == 'direct' else 10.0 * tolerance) * scale
+        assert np.all(residual <= allowedResidual), "Steady state solve did not converge"
+        return sol
+
+    @staticmethod
+    def __getNullVector(M):
+        """
+        Gets the null vector of an irreducible singular Metzler matrix, the
+        block of a closed class. Fixing its first entry to 1 leaves a
+        nonsingular system for the others.
+
+        Args:
+            M: Sparse (class DOFs x class DOFs) matrix
+        """
+        nullVector = np.ones(M.shape[0])
+        if M.shape[0] > 1:
+            nullVector[1:] = splu(M[1:, 1:].tocsc()).solve(-M[1:, 0].toarray().reshape(-1))
+        return nullVector
+
+    def __getFlowParameters(self, configuration):
+        """
+        Gets the volumes, system flow rate, flow fractions and absolute flow
+        rates with the overrides of a configuration applied. The flows are
+        checked for mass balance when the configuration changes them.
+
+        Args:
+            configuration: Parameter overrides of a schedule or variant, None
+                           uses the values stored in the model
+        """
+        volumes = self.volumes
+        volumetricFlowRate = self.volumetricFlowRate
+        flowFractions = self.flowFractions
+        absoluteFlowRates = self.flowRates
+        isFlowChanged = False
+        if configuration is not None:
+            if configuration.get('volumetricFlowRate') is not None:
+                volumetricFlowRate = configuration['volumetricFlowRate']
+            if configuration.get('volumes'):
+                volumes = volumes.copy()
+                for componentName, volume in configuration['volumes'].items():
+                    volumes[self.componentIndex[componentName]] = volume
+            # A flow fraction or an absolute flow rate replaces the flow of
+            # the connection
+            if configuration.get('flowFractions'):
+                flowFractions = flowFractions.copy()
+                absoluteFlowRates = absoluteFlowRates.copy()
+                for (feedName, targetName), flowFraction in configuration['flowFractions'].items():
+                    indices = self.getConnectionIndices(feedName, targetName)
+                    flowFractions[indices] = flowFraction
+                    absoluteFlowRates[indices] = 0.0
+            if configuration.get('flowRates'):
+                flowFractions = flowFractions.copy()
+                absoluteFlowRates = absoluteFlowRates.copy()
+                for (feedName, targetName), flowRate in configuration['flowRates'].items():
+                    indices = self.getConnectionIndices(feedName, targetName)
+                    flowFractions[indices] = 0.0
+                    absoluteFlowRates[indices] = flowRate
+            # Scaling the system flow rate only keeps the flows balanced when
+            # no connection has an absolute flow rate
+            isFlowChanged = (bool(configuration.get('flowFractions')) or
+                bool(configuration.get('flowRates')) or
+                (configuration.get('volumetricFlowRate') is not None and
+                np.any(absoluteFlowRates)))
+
+        if isFlowChanged:
+            checkMassBalance(self.numComponents, self.feedIDs, self.targetIDs,
+                volumetricFlowRate * flowFractions + absoluteFlowRates)
+        return volumes, volumetricFlowRate, flowFractions, absoluteFlowRates
+
+    def __expandFlowMatrix(self, F, G, boundaryConcentrations):
+        """
+        Expands the component level flow and feed matrices to the DOF level
+        transition matrix and source vector
+
+        Args:
+            F:                      Component level flow matrix
+            G:                      Boundary feed matrix
+            boundaryConcentrations: (boundaries x species) boundary concentrations
+        """
+        A = expandSpecies(F, self.numSpecies)
+        if not self.isSpeciesDecoupled():
+            A = A + self.buildReactionMatrix()
+        s = (G @ boundaryConcentrations).reshape(-1)
+        return A, s
+
+    def __getConnectionEndName(self, componentID, boundaryID):
+        """
+        Gets the name of one end of a connection
+
+        Args:
+            componentID: Component ID of the end, -1 for a boundary component
+            boundaryID:  Boundary ID of the end, -1 for a regular component
+        """
+        if componentID >= 0:
+            return self.componentNames[componentID]
+        return self.boundaryNames[boundaryID]
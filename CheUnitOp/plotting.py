@@ -0,0 +1,141 @@
+import os
+import re
+
+def _newFigure():
+    """
+    Builds a figure attached to the non interactive Agg canvas. pyplot is
+    never imported, so plotting does not depend on a display or on the
+    global pyplot state. matplotlib is only imported when a plot is made.
+    """
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    figure = Figure()
+    FigureCanvasAgg(figure)
+    return figure
+
+def _getFileName(systemName, kind, name, fileFormat):
+    """
+    Builds the default file name of a plot. The kind keeps species and
+    component plots of the same name apart, and characters that are not safe
+    in file names, like path separators, are replaced by underscores.
+
+    Args:
+        systemName: Name of the system
+        kind:       'species' or 'component'
+        name:       Name of the species or component
+        fileFormat: File extension
+    """
+    fileName = f"{systemName}_{kind}_{name}_concentrations"
+    return re.sub(r"[^A-Za-z0-9._-]", "_", fileName) + "." + fileFormat
+
+def _drawSpecies(figure, system, speciesName):
+    """
+    Draws the concentration of one species in every component
+
+    Args:
+        figure:      Figure to draw on
+        system:      Solved system object
+        speciesName: Name of the species
+    """
+    axes = figure.add_subplot()
+    for component in system.components:
+        solution = system.getSolution(component.name, speciesName)
+        axes.plot(system.timeSteps, solution, label = component.name)
+    _formatAxes(axes, speciesName)
+
+def _drawComponent(figure, system, componentName):
+    """
+    Draws the concentration of every species in one component
+
+    Args:
+        figure:        Figure to draw on
+        system:        Solved system object
+        componentName: Name of the component
+    """
+    axes = figure.add_subplot()
+    for speciesName, solution in system.getSolution(componentName).items():
+        axes.plot(system.timeSteps, solution, label = speciesName)
+    _formatAxes(axes, componentName)
+
+def _formatAxes(axes, title):
+    """
+    Adds the legend, grid, title and axis labels
+
+    Args:
+        axes:  Axes to format
+        title: Title of the plot
+    """
+    axes.legend()
+    axes.grid()
+    axes.set_title(title)
+    axes.set_xlabel("Time [sec]")
+    axes.set_ylabel("Concentration")
+
+def plotSpecies(system, speciesName, fileName = None):
+    """
+    Plots the concentration of one species in every component of a solved
+    system and saves it to a png file
+
+    Args:
+        system:      Solved system object
+        speciesName: Name of the species
+        fileName:    Name of the file, defaults to
+                     <system name>_species_<species name>_concentrations.png
+    """
+    if fileName is None:
+        fileName = _getFileName(system.name, "species", speciesName, "png")
+    figure = _newFigure()
+    _drawSpecies(figure, system, speciesName)
+    figure.savefig(fileName)
+    return fileName
+
+def plotComponent(system, componentName, fileName = None):
+    """
+    Plots the concentration of every species in one component of a solved
+    system and saves it to a png file
+
+    Args:
+        system:        Solved system object
+        componentName: Name of the component
+        fileName:      Name of the file, defaults to
+                       <system name>_component_<component name>_concentrations.png
+    """
+    if fileName is None:
+        fileName = _getFileName(system.name, "component", componentName, "png")
+    figure = _newFigure()
+    _drawComponent(figure, system, componentName)
+    figure.savefig(fileName)
+    return fileName
+
+def exportPlots(system, directory = ".", fileFormat = "png"):
+    """
+    Renders every species plot and every component plot of a solved system in
+    one pass and saves them to a directory. One figure is reused for all
+    plots. Names that are the same after replacing unsafe characters get a
+    numbered suffix, so no plot overwrites another. Returns the names of the
+    written files.
+
+    Args:
+        system:     Solved system object
+        directory:  Directory the plots are saved to
+        fileFormat: Image format understood by matplotlib, e.g. png or pdf
+    """
+    os.makedirs(directory, exist_ok = True)
+    figure = _newFigure()
+    plots = ([(_drawSpecies, "species", spec.name) for spec in system.globalSpecies] +
+        [(_drawComponent, "component", component.name) for component in system.components])
+    fileNames = []
+    usedFileNames = set()
+    for draw, kind, name in plots:
+        fileName = _getFileName(system.name, kind, name, fileFormat)
+        root, extension = os.path.splitext(fileName)
+        suffix = 1
+        while fileName in usedFileNames:
+            suffix += 1
+            fileName = f"{root}_{suffix}{extension}"
+        usedFileNames.add(fileName)
+        draw(figure, system, name)
+        fileNames.append(os.path.join(directory, fileName))
+        figure.savefig(fileNames[-1])
+        figure.clear()
+    return fileNames
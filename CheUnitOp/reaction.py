@@ -0,0 +1,54 @@
+from collections.abc import Iterable
+
+class FirstOrderReaction:
+    """
+    A first order reaction or decay of one species into another, as in first
+    order kinetics or radioactive decay chains. Within each component it
+    reacts at
+
+        d[reactant] / dt = -rateConstant * [reactant]
+        d[product] / dt  = productFraction * rateConstant * [reactant]
+
+    A reaction without a product removes the reactant from the system. Chains
+    and branches are built from several reactions.
+
+    Args:
+        reactantName:    Name of the reacting species
+        productName:     Name of the species formed, None if nothing is tracked
+        rateConstant:    First order rate constant in 1/s
+        productFraction: Concentration of product formed per concentration of
+                         reactant consumed, e.g. a branching ratio
+        componentNames:  Names of the components the reaction takes place in,
+                         None for every component in the system
+    """
+    def __init__(self, reactantName, productName, rateConstant, productFraction = 1.0,
+        componentNames = None):
+        assert(isinstance(reactantName, str))
+        assert(productName is None or isinstance(productName, str))
+        assert(productName != reactantName)
+        assert(rateConstant >= 0.0)
+        assert(productFraction >= 0.0)
+        if isinstance(componentNames, str):
+            componentNames = [componentNames]
+        elif isinstance(componentNames, Iterable):
+            componentNames = list(componentNames)
+            for componentName in componentNames:
+                assert(isinstance(componentName, str))
+        self.reactantName = reactantName
+        self.productName = productName
+        self.rateConstant = rateConstant
+        self.productFraction = productFraction
+        self.componentNames = componentNames
+
+    def printInfo(self):
+        """
+        Prints information about the reaction
+        """
+        productName = self.productName if self.productName else "None"
+        print("Reaction: " + self.reactantName + " -> " + productName)
+        print("Rate constant (1/s): " + str(self.rateConstant))
+        print("Product fraction: " + str(self.productFraction))
+        if self.componentNames is None:
+            print("Components: All")
+        else:
+            print("Components: " + ", ".join(self.componentNames))
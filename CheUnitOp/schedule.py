@@ -0,0 +1,125 @@
+class Schedule:
+    """
+    Piecewise constant operating schedule for a system. Each event changes one
+    operating parameter at a given time, and the change holds until a later
+    event overrides it. Events at time 0 or before are applied from the start
+    of the solve. Parameters without events keep the values set on the system.
+
+    Parameters are referenced by name so a schedule can be built before the
+    system is finalized:
+        volumetric flow rate:   system wide flow rate in m^3/s
+        flow fraction:          (feed component name, target component name)
+        flow rate:              (feed component name, target component name)
+        boundary concentration: (boundary component name, species name)
+    """
+    def __init__(self):
+        self.events = []
+
+    def setVolumetricFlowRate(self, time, volumetricFlowRate):
+        """
+        Changes the system volumetric flow rate at the given time
+
+        Args:
+            time:               Time of the change in seconds
+            volumetricFlowRate: New volumetric flow rate in m^3/s
+        """
+        assert(volumetricFlowRate >= 0.0)
+        self.events.append((time, 'volumetricFlowRate', None, volumetricFlowRate))
+
+    def setFlowFraction(self, time, feedComponentName, targetComponentName, flowFraction):
+        """
+        Changes the flow fraction of an existing connection at the given time.
+        The flow fraction replaces an absolute flow rate of the connection.
+        Fractions that belong together, like the two legs of a split, should be
+        changed at the same time so the flows stay balanced.
+
+        Args:
+            time:                Time of the change in seconds
+            feedComponentName:   Name of the component feeding the connection
+            targetComponentName: Name of the component receiving the feed
+            flowFraction:        New flow fraction of the connection
+        """
+        assert(isinstance(feedComponentName, str))
+        assert(isinstance(targetComponentName, str))
+        assert(flowFraction >= 0.0)
+        self.events.append((time, 'flowFractions',
+            (feedComponentName, targetComponentName), flowFraction))
+
+    def setFlowRate(self, time, feedComponentName, targetComponentName, flowRate):
+        """
+        Changes a connection to an absolute flow rate at the given time. The
+        flow rate replaces the flow fraction of the connection. Flow rates
+        that belong together should be changed at the same time so the flows
+        stay balanced.
+
+        Args:
+            time:                Time of the change in seconds
+            feedComponentName:   Name of the component feeding the connection
+            targetComponentName: Name of the component receiving the feed
+            flowRate:            New volumetric flow rate of the connection in m^3/s
+        """
+        assert(isinstance(feedComponentName, str))
+        assert(isinstance(targetComponentName, str))
+        assert(flowRate >= 0.0)
+        self.events.append((time, 'flowRates',
+            (feedComponentName, targetComponentName), flowRate))
+
+    def setBoundaryConcentration(self, time, boundaryComponentName, speciesName, concentration):
+        """
+        Changes a species concentration of an inlet boundary at the given time
+
+        Args:
+            time:                  Time of the change in seconds
+            boundaryComponentName: Name of the inlet boundary component
+            speciesName:           Name of the species
+            concentration:         New concentration in kg/m^3
+        """
+        assert(isinstance(boundaryComponentName, str))
+        assert(isinstance(speciesName, str))
+        assert(concentration >= 0.0)
+        self.events.append((time, 'boundaryConcentrations',
+            (boundaryComponentName, speciesName), concentration))
+
+    def getBreakpoints(self):
+        """
+        Gets the sorted times after 0 at which the configuration changes
+        """
+        return sorted(set(event[0] for event in self.events if event[0] > 0.0))
+
+    def getConfigurations(self):
+        """
+        Gets one set of parameter overrides per schedule interval. The first
+        configuration holds from time 0 until the first breakpoint and
+        configuration i holds from breakpoint i-1 until breakpoint i. Each
+        configuration is a dict in the form
+
+            {'volumetricFlowRate':     flow rate or None,
+             'flowFractions':          {(feed name, target name): fraction},
+             'flowRates':              {(feed name, target name): flow rate},
+             'boundaryConcentrations': {(boundary name, species name): con}}
+        """
+        events = sorted(self.events, key = lambda event: event[0])
+        configuration = {'volumetricFlowRate': None, 'flowFractions': {},
+            'flowRates': {}, 'boundaryConcentrations': {}}
+        configurations = []
+        breakpoints = [0.0] + self.getBreakpoints()
+        eventIndex = 0
+        for breakpoint in breakpoints:
+            while eventIndex < len(events) and events[eventIndex][0] <= breakpoint:
+                time, parameter, key, value = events[eventIndex]
+                if key is None:
+                    configuration[parameter] = value
+                else:
+                    configuration[parameter][key] = value
+                # A flow fraction and a flow rate of one connection replace
+                # each other, so the latest event sets the flow
+                if parameter == 'flowFractions':
+                    configuration['flowRates'].pop(key, None)
+                elif parameter == 'flowRates':
+                    configuration['flowFractions'].pop(key, None)
+                eventIndex += 1
+            configurations.append({'volumetricFlowRate': configuration['volumetricFlowRate'],
+                'flowFractions': dict(configuration['flowFractions']),
+                'flowRates': dict(configuration['flowRates']),
+                'boundaryConcentrations': dict(configuration['boundaryConcentrations'])})
+        return configurations
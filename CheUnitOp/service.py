@@ -0,0 +1,202 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+import numpy as np
+
+from CheUnitOp.cache import PropagatorCache
+from CheUnitOp.model import CompiledModel
+from CheUnitOp.solver import ExpmSolver
+from CheUnitOp.storage import MemoryStorage
+
+class ScenarioResult:
+    """
+    Solution of one scenario. The result owns its arrays, which are read
+    only, so results can be handed between threads and kept after the
+    service is closed.
+
+    Args:
+        componentNames: Names of the components, indexed by ID
+        speciesNames:   Names of the species, indexed by ID
+        times:          Times of the stored steps
+        solutionArray:  (stored steps x components x species) solution
+    """
+    def __init__(self, componentNames, speciesNames, times, solutionArray):
+        self.componentNames = tuple(componentNames)
+        self.speciesNames = tuple(speciesNames)
+        self.componentIndex = {name: i for i, name in enumerate(self.componentNames)}
+        self.speciesIndex = {name: i for i, name in enumerate(self.speciesNames)}
+        self.times = np.array(times, dtype=float)
+        self.solutionArray = np.asarray(solutionArray)
+        self.times.setflags(write = False)
+        self.solutionArray.setflags(write = False)
+
+    def getSolution(self, componentName = None, speciesName = None):
+        """
+        Gets the solution in the same form as GenericSystem.getSolution.
+        Concentration histories are views into the solution array.
+
+        Args:
+            componentName: Name of the component, None for every component
+            speciesName:   Name of the species, needs a component name
+        """
+        if componentName and speciesName:
+            return self.solutionArray[:, self.componentIndex[componentName],
+                self.speciesIndex[speciesName]]
+        elif componentName:
+            componentID = self.componentIndex[componentName]
+            return {name: self.solutionArray[:, componentID, speciesID]
+                for speciesID, name in enumerate(self.speciesNames)}
+        return {name: self.getSolution(name) for name in self.componentNames}
+
+    def getCon(self, componentName, speciesName):
+        """
+        Gets the concentration at the last stored step
+
+        Args:
+            componentName: Name of the component
+            speciesName:   Name of the species
+        """
+        return self.solutionArray[-1, self.componentIndex[componentName],
+            self.speciesIndex[speciesName]]
+
+def solveScenario(model, tEnd, numSteps, variant = None, schedule = None, saveEvery = 1,
+    solver = None, propagatorCache = None):
+    """
+    Solves one scenario of a compiled model and returns a new ScenarioResult.
+    The model is never changed, so any number of scenarios can be solved on
+    one model at the same time.
+
+    Args:
+        model:           CompiledModel object
+        tEnd:            End time of the simulation
+        numSteps:        Number of steps to take
+        variant:         Variant object with the parameters of the scenario,
+                         None uses the parameters of the model
+        schedule:        Piecewise constant operating schedule
+        saveEvery:       Only every saveEvery-th step is stored
+        solver:          Solver object, None uses an ExpmSolver
+        propagatorCache: Cache the propagators are fetched from
+    """
+    if variant is not None:
+        model = model.withVariant(variant)
+    times, solutionArray = model.solve(tEnd, numSteps, solver, propagatorCache,
+        MemoryStorage(saveEvery), schedule)
+    return ScenarioResult(model.componentNames, model.speciesNames, times, solutionArray)
+
+# Model, solver and cache of a worker process, set once by _initWorker so the
+# model is only sent to every worker once instead of with every scenario
+_workerState = {}
+
+def _initWorker(model, solver, propagatorCache):
+    """
+    Stores the shared state of a worker process
+
+    Args:
+        model:           CompiledModel object
+        solver:          Solver object
+        propagatorCache: Cache of the worker, unpickled empty
+    """
+    _workerState['model'] = model
+    _workerState['solver'] = solver
+    _workerState['propagatorCache'] = propagatorCache
+
+def _solveInWorker(tEnd, numSteps, variant, schedule, saveEvery):
+    """
+    Solves one scenario on the model of a worker process
+
+    Args:
+        tEnd:      End time of the simulation
+        numSteps:  Number of steps to take
+        variant:   Variant object or None
+        schedule:  Schedule object or None
+        saveEvery: Only every saveEvery-th step is stored
+    """
+    return solveScenario(_workerState['model'], tEnd, numSteps, variant, schedule, saveEvery,
+        _workerState['solver'], _workerState['propagatorCache'])
+
+class ScenarioService:
+    """
+    Solves what-if scenarios of one plant concurrently. The plant is compiled
+    once and the compiled model, its assembled matrices and one propagator
+    cache are shared by every request, so scenarios with the same parameters
+    and step size reuse the same propagator. Each request gets a new
+    ScenarioResult and nothing shared is changed by a solve.
+
+    Threads are the default. The propagator builds and the matrix products
+    of the steps run in numpy and scipy with the GIL released, so threads
+    solve in parallel without copying the model. With useProcesses, the
+    model is sent to every worker process once and each worker has its own
+    cache. A DiskPropagatorCache is reopened on the same directory in every
+    worker, so the workers still share the propagators on disk.
+
+    Args:
+        model:           Finalized GenericSystem or CompiledModel object
+        maxWorkers:      Number of worker threads or processes, None uses
+                         the executor default
+        useProcesses:    Solves in a process pool instead of a thread pool
+        solver:          Solver object, None uses an ExpmSolver
+        propagatorCache: Cache shared by the requests, None uses a new cache
+    """
+    def __init__(self, model, maxWorkers = None, useProcesses = False, solver = None,
+        propagatorCache = None):
+        if not isinstance(model, CompiledModel):
+            model = model.compile()
+        self.model = model
+        self.solver = ExpmSolver() if solver is None else solver
+        self.propagatorCache = PropagatorCache() if propagatorCache is None else propagatorCache
+        self.useProcesses = useProcesses
+        if useProcesses:
+            self.__executor = ProcessPoolExecutor(max_workers = maxWorkers,
+                initializer = _initWorker,
+                initargs = (self.model, self.solver, self.propagatorCache))
+        else:
+            self.__executor = ThreadPoolExecutor(max_workers = maxWorkers)
+
+    def submit(self, tEnd, numSteps, variant = None, schedule = None, saveEvery = 1):
+        """
+        Submits a scenario and returns a concurrent.futures.Future of its
+        ScenarioResult
+
+        Args:
+            tEnd:      End time of the simulation
+            numSteps:  Number of steps to take
+            variant:   Variant object with the parameters of the scenario,
+                       None uses the parameters of the model
+            schedule:  Piecewise constant operating schedule
+            saveEvery: Only every saveEvery-th step is stored
+        """
+        if self.useProcesses:
+            return self.__executor.submit(_solveInWorker, tEnd, numSteps, variant, schedule,
+                saveEvery)
+        return self.__executor.submit(solveScenario, self.model, tEnd, numSteps, variant,
+            schedule, saveEvery, self.solver, self.propagatorCache)
+
+    def solve(self, tEnd, numSteps, variant = None, schedule = None, saveEvery = 1):
+        """
+        Solves a scenario in the pool and waits for its ScenarioResult. The
+        arguments are the same as for submit.
+        """
+        return self.submit(tEnd, numSteps, variant, schedule, saveEvery).result()
+
+    async def solveAsync(self, tEnd, numSteps, variant = None, schedule = None, saveEvery = 1):
+        """
+        Solves a scenario in the pool without blocking the event loop and
+        returns its ScenarioResult. The arguments are the same as for submit.
+        """
+        return await asyncio.wrap_future(self.submit(tEnd, numSteps, variant, schedule,
+            saveEvery))
+
+    def close(self, wait = True):
+        """
+        Shuts the pool down
+
+        Args:
+            wait: Waits for the submitted scenarios to finish
+        """
+        self.__executor.shutdown(wait = wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
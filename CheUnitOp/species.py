@@ -1,7 +1,10 @@
 from abc import ABC
-from collections.abc import Iterable
+from collections.abc import Iterable, Mapping, Sequence
+
+import numpy as np
 
 class SpeciesBase(ABC):
+    __slots__ = ('name', 'molarMass', 'ID')
 
     def __init__(self, name, molarMass = 0.0):
         assert(isinstance(name, str))
@@ -18,9 +21,12 @@ class SpeciesBase(ABC):
         print("Species molar mass: " + str(self.molarMass))
 
 class Species(SpeciesBase):
+    __slots__ = ('componentInitialConcentration',)
 
-    def __init__(self, name, molarMass = 0.0, componentInitialConcentration = []):
+    def __init__(self, name, molarMass = 0.0, componentInitialConcentration = None):
         super(Species, self).__init__(name, molarMass)
+        # Copies the list so species never share a default list
+        componentInitialConcentration = list(componentInitialConcentration or [])
         for tuple in componentInitialConcentration:
             self.__checkComponentConcentrationTuple(tuple)
         self.componentInitialConcentration = componentInitialConcentration
@@ -55,24 +61,155 @@ class Species(SpeciesBase):
         assert(isinstance(tuple[0], str))
         assert(tuple[1] >= 0.0)
 
-class ComponentSpecies(SpeciesBase):
+class ComponentSpeciesTable:
+    """
+    Shared arrays that hold the species of every component of a finalized
+    system. The components and boundary components are the rows, numbered
+    like the nodes of the flow graph: components first, then boundary
+    components. The table stores the initial concentrations and the solution
+    history of the components after a solve. ComponentSpecies objects are
+    views into the table, created on access, so the memory and finalize time
+    scale with these arrays, not with the number of (component, species)
+    pairs.
 
-    def __init__(self, name, molarMass, componentName, speciesID, initialCon = 0.0):
-        super(ComponentSpecies, self).__init__(name, molarMass)
-        assert(initialCon >= 0.0)
-        self.componentName = componentName
-        self.concentrations = [initialCon]
-        self.ID = speciesID
+    Args:
+        nodeNames:             Names of the components, then the boundary
+                               components
+        numComponents:         Number of components that are not boundaries
+        speciesNames:          Names of the species, indexed by ID
+        molarMasses:           Molar masses of the species
+        initialConcentrations: (nodes x species) initial concentrations in kg/m^3
+    """
+    def __init__(self, nodeNames, numComponents, speciesNames, molarMasses,
+        initialConcentrations):
+        self.nodeNames = tuple(nodeNames)
+        self.numComponents = numComponents
+        self.speciesNames = tuple(speciesNames)
+        self.molarMasses = np.array(molarMasses, dtype=float)
+        self.concentrations = np.array(initialConcentrations, dtype=float).reshape(
+            len(self.nodeNames), len(self.speciesNames))
+        self.solutionArray = None
+
+    @property
+    def numSpecies(self):
+        return len(self.speciesNames)
 
-    def addCon(self, value):
+    def getConcentrations(self, nodeID, speciesID):
         """
-        Adds a solution to the concentration history
+        Gets the concentration history of one species in one component. This
+        is a view into the table, so no data is copied.
 
         Args:
-            value: The concentration in kg/m^3
+            nodeID:    Row of the component in the table
+            speciesID: ID of the species
         """
-        assert(value >= 0.0)
-        self.concentrations.append(value)
+        if self.solutionArray is not None and nodeID < self.numComponents:
+            return self.solutionArray[:, nodeID, speciesID]
+        return self.concentrations[nodeID, speciesID:speciesID+1]
+
+    def setSolution(self, solutionArray):
+        """
+        Sets the (steps x components x species) solution of a solve. The
+        boundary components keep their concentrations.
+
+        Args:
+            solutionArray: Solution array owned by the system
+        """
+        self.solutionArray = solutionArray
+
+    def getCurrentConcentrations(self):
+        """
+        Gets a (nodes x species) array of the most recent concentration of
+        every species in every component
+        """
+        current = self.concentrations.copy()
+        if self.solutionArray is not None:
+            current[:self.numComponents] = self.solutionArray[-1]
+        return current
+
+class ComponentSpeciesSequence(Sequence):
+    """
+    Read only sequence of the species of one component. The ComponentSpecies
+    views are created on access.
+
+    Args:
+        table:  ComponentSpeciesTable of the system
+        nodeID: Row of the component in the table
+    """
+    __slots__ = ('table', 'nodeID')
+
+    def __init__(self, table, nodeID):
+        self.table = table
+        self.nodeID = nodeID
+
+    def __len__(self):
+        return self.table.numSpecies
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("species index out of range")
+        return ComponentSpecies(self.table, self.nodeID, index)
+
+class SolutionData(Mapping):
+    """
+    Read only mapping of component name to a dict of species name to the
+    concentration history of the species. The dict of a component is built
+    on access and holds views into the solution array.
+
+    Args:
+        solutionArray:  (steps x components x species) solution
+        componentIndex: Dict of component name: component ID
+        speciesNames:   Names of the species, indexed by ID
+    """
+    __slots__ = ('solutionArray', 'componentIndex', 'speciesNames')
+
+    def __init__(self, solutionArray, componentIndex, speciesNames):
+        self.solutionArray = solutionArray
+        self.componentIndex = componentIndex
+        self.speciesNames = tuple(speciesNames)
+
+    def __getitem__(self, componentName):
+        componentID = self.componentIndex[componentName]
+        return {name: self.solutionArray[:, componentID, speciesID]
+            for speciesID, name in enumerate(self.speciesNames)}
+
+    def __iter__(self):
+        return iter(self.componentIndex)
+
+    def __len__(self):
+        return len(self.componentIndex)
+
+class ComponentSpecies(SpeciesBase):
+    """
+    A species in one component. This is a light view into the
+    ComponentSpeciesTable of the system, so the concentrations are stored in
+    the table and not in the object.
+
+    Args:
+        table:     ComponentSpeciesTable of the system
+        nodeID:    Row of the component in the table
+        speciesID: ID of the species
+    """
+    __slots__ = ('table', 'nodeID')
+
+    def __init__(self, table, nodeID, speciesID):
+        super(ComponentSpecies, self).__init__(table.speciesNames[speciesID],
+            table.molarMasses[speciesID])
+        self.table = table
+        self.nodeID = nodeID
+        self.ID = speciesID
+
+    @property
+    def componentName(self):
+        return self.table.nodeNames[self.nodeID]
+
+    @property
+    def concentrations(self):
+        return self.table.getConcentrations(self.nodeID, self.ID)
 
     def getCon(self):
         """
@@ -0,0 +1,151 @@
+import time
+import tracemalloc
+
+from scipy.sparse import issparse
+
+class PhaseStats:
+    """
+    Accumulated statistics of one phase of the solve
+
+    Args:
+        name: Name of the phase
+    """
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.wallTime = 0.0
+        self.peakMemory = 0
+        self.matrixShape = None
+        self.matrixNnz = None
+
+class SolveStats:
+    """
+    Collects per phase wall times, call counts, matrix sizes and optionally
+    peak memory of a system, and calls step callbacks for progress reporting.
+    A system only records statistics when a stats object is set with
+    GenericSystem.setStats, otherwise every hook is skipped by a single None
+    check, so the instrumentation costs nothing when it is not used.
+
+    Phases can be nested, e.g. the propagator build inside the solve. The peak
+    memory of a phase is the peak traced memory of the process while the
+    phase ran, which includes memory held before the phase started. Memory is
+    only traced when traceMemory is set, since tracing slows the solve down.
+
+    Args:
+        traceMemory: Traces the peak memory of every phase with tracemalloc
+    """
+    def __init__(self, traceMemory = False):
+        self.traceMemory = traceMemory
+        self.phases = {}
+        self.counters = {}
+        self.stepCallbacks = []
+        self.__activePhases = []
+
+    def addStepCallback(self, callback, every = 1):
+        """
+        Adds a callback that is called after every every-th step of a solve as
+        callback(step, time, solution). The solution is a (components x
+        species) view of the current step and must not be changed.
+
+        Args:
+            callback: Function called with the step number, time and solution
+            every:    The callback is called when the step is a multiple of this
+        """
+        assert(callable(callback))
+        assert(isinstance(every, int) and every >= 1)
+        self.stepCallbacks.append((callback, every))
+
+    def startPhase(self, name):
+        """
+        Starts timing a phase
+
+        Args:
+            name: Name of the phase
+        """
+        if self.traceMemory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            self.__updatePeakMemory()
+        self.__activePhases.append([name, time.perf_counter(), 0])
+
+    def endPhase(self, name, matrix = None):
+        """
+        Stops timing the most recently started phase and adds it to the stats
+
+        Args:
+            name:   Name of the phase, must match the started phase
+            matrix: Matrix built in the phase, its shape and nnz are recorded
+        """
+        endTime = time.perf_counter()
+        if self.traceMemory:
+            self.__updatePeakMemory()
+        phaseName, startTime, peakMemory = self.__activePhases.pop()
+        assert(phaseName == name)
+        if name not in self.phases:
+            self.phases[name] = PhaseStats(name)
+        phase = self.phases[name]
+        phase.calls += 1
+        phase.wallTime += endTime - startTime
+        phase.peakMemory = max(phase.peakMemory, peakMemory)
+        if matrix is not None:
+            phase.matrixShape = tuple(matrix.shape)
+            phase.matrixNnz = int(matrix.nnz) if issparse(matrix) else int(matrix.size)
+
+    def count(self, name, increment = 1):
+        """
+        Adds to a named counter
+
+        Args:
+            name:      Name of the counter
+            increment: Amount added to the counter
+        """
+        self.counters[name] = self.counters.get(name, 0) + increment
+
+    def callStepCallbacks(self, step, t, solution):
+        """
+        Calls the step callbacks that are due at this step. Used by the solve.
+
+        Args:
+            step:     Step number
+            t:        Time at the end of the step
+            solution: (components x species) solution of the step
+        """
+        for callback, every in self.stepCallbacks:
+            if step % every == 0:
+                callback(step, t, solution)
+
+    def reset(self):
+        """
+        Removes all recorded phases and counters. Step callbacks are kept.
+        """
+        assert(not self.__activePhases)
+        self.phases = {}
+        self.counters = {}
+
+    def printInfo(self):
+        """
+        Prints the recorded phases and counters
+        """
+        print("################################################################")
+        print("Solve Statistics")
+        print(f"{'Phase':<24} {'Calls':>6} {'Wall time (s)':>14} {'Peak memory (MB)':>17} "
+            f"{'Matrix':>14} {'nnz':>10}")
+        for phase in self.phases.values():
+            peakMemory = f"{phase.peakMemory / 2**20:.2f}" if self.traceMemory else "-"
+            shape = "x".join(map(str, phase.matrixShape)) if phase.matrixShape else "-"
+            nnz = str(phase.matrixNnz) if phase.matrixNnz is not None else "-"
+            print(f"{phase.name:<24} {phase.calls:>6} {phase.wallTime:>14.6f} "
+                f"{peakMemory:>17} {shape:>14} {nnz:>10}")
+        for name, value in self.counters.items():
+            print(name + ": " + str(value))
+        print("################################################################")
+
+    def __updatePeakMemory(self):
+        """
+        Adds the peak traced memory since the last update to every active
+        phase and resets the peak
+        """
+        peakMemory = tracemalloc.get_traced_memory()[1]
+        for activePhase in self.__activePhases:
+            activePhase[2] = max(activePhase[2], peakMemory)
+        tracemalloc.reset_peak()
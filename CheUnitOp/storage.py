@@ -0,0 +1,200 @@
+from abc import ABC, abstractmethod
+import os
+
+import numpy as np
+
+def getSavedSteps(numSteps, saveEvery):
+    """
+    Gets the step numbers that are stored for a run of numSteps steps when
+    every saveEvery-th step is kept. The first and last steps are always kept.
+
+    Args:
+        numSteps:  Number of steps in the run
+        saveEvery: Only every saveEvery-th step is stored
+    """
+    savedSteps = np.arange(0, numSteps+1, saveEvery)
+    if savedSteps[-1] != numSteps:
+        savedSteps = np.append(savedSteps, numSteps)
+    return savedSteps
+
+class StorageBase(ABC):
+    """
+    Abstract class that all solution storages must inherit from. A storage
+    receives the solution one step at a time while the system is solved and
+    keeps every saveEvery-th step. The first and last steps are always kept.
+
+    Args:
+        saveEvery: Only every saveEvery-th step is stored
+    """
+
+    def __init__(self, saveEvery = 1):
+        assert(isinstance(saveEvery, int))
+        assert(saveEvery >= 1)
+        self.saveEvery = saveEvery
+        self.savedSteps = None
+        self.numRowsWritten = 0
+
+    def begin(self, numSteps, shape):
+        """
+        Prepares the storage for a new run. Returns the step numbers that will
+        be stored.
+
+        Args:
+            numSteps: Number of steps in the run
+            shape:    Shape of the solution at a single step
+        """
+        self.savedSteps = getSavedSteps(numSteps, self.saveEvery)
+        self.numRowsWritten = 0
+        self._allocate(len(self.savedSteps), shape)
+        return self.savedSteps
+
+    def write(self, sol):
+        """
+        Writes the solution of the next stored step
+
+        Args:
+            sol: Solution at the step
+        """
+        self._write(self.numRowsWritten, sol)
+        self.numRowsWritten += 1
+
+    @abstractmethod
+    def _allocate(self, numRows, shape):
+        """
+        Allocates room for numRows stored steps
+
+        Args:
+            numRows: Number of stored steps
+            shape:   Shape of the solution at a single step
+        """
+        pass
+
+    @abstractmethod
+    def _write(self, row, sol):
+        """
+        Writes a solution to a row of the storage
+
+        Args:
+            row: Row of the storage
+            sol: Solution at the step
+        """
+        pass
+
+    @abstractmethod
+    def end(self):
+        """
+        Finishes the run and returns the stored solution array with shape
+        (stored steps, components, species). A run that stopped early only
+        returns the rows that were written.
+        """
+        pass
+
+class MemoryStorage(StorageBase):
+    """
+    Default storage. Keeps the stored steps in one preallocated array in
+    memory.
+
+    Args:
+        saveEvery: Only every saveEvery-th step is stored
+    """
+
+    def __init__(self, saveEvery = 1):
+        super(MemoryStorage, self).__init__(saveEvery)
+        self.data = None
+
+    def _allocate(self, numRows, shape):
+        self.data = np.empty((numRows,) + tuple(shape))
+
+    def _write(self, row, sol):
+        self.data[row] = sol
+
+    def end(self):
+        assert(self.numRowsWritten <= len(self.savedSteps))
+        return self.data[:self.numRowsWritten]
+
+class MemmapStorage(StorageBase):
+    """
+    Streams the stored steps to a memory mapped .npy file while the system is
+    solved. Steps are collected in an in-memory chunk that is written to disk
+    whenever it fills up, so peak memory depends on the chunk and solution
+    size and not on the number of steps. After the run the file is reopened
+    read only and the solution is read lazily from disk. The file can also be
+    loaded later with numpy.load(fileName, mmap_mode = 'r'). Every solve
+    overwrites the file, so views from an earlier solve must not be used after
+    solving again.
+
+    Args:
+        fileName:  Name of the .npy file the solution is written to
+        saveEvery: Only every saveEvery-th step is stored
+        chunkSize: Number of stored steps kept in memory before writing to disk
+    """
+
+    def __init__(self, fileName, saveEvery = 1, chunkSize = 256):
+        super(MemmapStorage, self).__init__(saveEvery)
+        assert(isinstance(fileName, str))
+        assert(chunkSize >= 1)
+        self.fileName = fileName
+        self.chunkSize = chunkSize
+        self.__file = None
+        self.__chunk = None
+        self.__chunkStart = 0
+        self.__chunkRows = 0
+
+    def _allocate(self, numRows, shape):
+        self.__file = np.lib.format.open_memmap(self.fileName, mode = 'w+',
+            dtype = np.float64, shape = (numRows,) + tuple(shape))
+        self.__chunk = np.empty((min(self.chunkSize, numRows),) + tuple(shape))
+        self.__chunkStart = 0
+        self.__chunkRows = 0
+
+    def _write(self, row, sol):
+        self.__chunk[self.__chunkRows] = sol
+        self.__chunkRows += 1
+        if self.__chunkRows == len(self.__chunk):
+            self.__flushChunk()
+
+    def end(self):
+        assert(self.numRowsWritten <= len(self.savedSteps))
+        self.__flushChunk()
+        shape = self.__file.shape
+        self.__file = None
+        self.__chunk = None
+        if self.numRowsWritten < shape[0]:
+            self.__truncate((self.numRowsWritten,) + shape[1:])
+        return np.load(self.fileName, mmap_mode = 'r')
+
+    def __truncate(self, shape):
+        """
+        Shrinks the file to the rows that were written. The header is rewritten
+        in place with the new shape, padded to its old length so the data
+        offset does not move.
+
+        Args:
+            shape: New shape of the stored array
+        """
+        with open(self.fileName, 'r+b') as f:
+            version = np.lib.format.read_magic(f)
+            headerStart = f.tell()
+            if version == (1, 0):
+                np.lib.format.read_array_header_1_0(f)
+                lengthBytes = 2
+            else:
+                np.lib.format.read_array_header_2_0(f)
+                lengthBytes = 4
+            dataOffset = f.tell()
+            header = repr({'descr': '<f8', 'fortran_order': False,
+                'shape': tuple(int(n) for n in shape)})
+            headerLength = dataOffset - headerStart - lengthBytes
+            f.seek(headerStart + lengthBytes)
+            f.write(header.ljust(headerLength - 1).encode('latin1') + b'\n')
+        os.truncate(self.fileName, dataOffset + int(np.prod(shape)) * 8)
+
+    def __flushChunk(self):
+        """
+        Writes the in-memory chunk to the file
+        """
+        chunkEnd = self.__chunkStart + self.__chunkRows
+        self.__file[self.__chunkStart:chunkEnd] = self.__chunk[:self.__chunkRows]
+        self.__file.flush()
+        self.__chunkStart = chunkEnd
+        self.__chunkRows = 0
@@ -1,11 +1,16 @@
 from collections.abc import Iterable
 
 import numpy as np
-from scipy.sparse import csr_matrix
-from scipy.linalg import expm
-import matplotlib.pyplot as plt
 
-from CheUnitOp.species import ComponentSpecies
+from CheUnitOp.species import ComponentSpeciesTable, ComponentSpeciesSequence, SolutionData
+from CheUnitOp.cache import PropagatorCache
+from CheUnitOp.solver import SolverBase, ExpmSolver, EigenSolver
+from CheUnitOp.storage import StorageBase, MemoryStorage
+from CheUnitOp.schedule import Schedule
+from CheUnitOp.model import CompiledModel
+from CheUnitOp.stats import SolveStats
+from CheUnitOp.flowgraph import FlowGraph
+from CheUnitOp import export
 
 class GenericSystem:
     """
@@ -22,13 +27,26 @@ class GenericSystem:
         self.name = name
         self.volumetricFlowRate = volumetricFlowRate
         self.globalSpecies = []
+        self.reactions = []
         self.components = []
         self.boundaryComponents = []
-        self.solver = None
+        self.componentIndex = {}
+        self.boundaryIndex = {}
+        self.speciesIndex = {}
+        self.connections = []
+        self.flowGraph = None
+        self.speciesTable = None
+        self.solver = ExpmSolver()
+        self.propagatorCache = PropagatorCache()
+        self.storage = MemoryStorage()
+        self.schedule = None
+        self.stats = None
         self.areComponentFinalized = False
         self.areSpeciesFinalized = False
         self.solutionData = None
+        self.solutionArray = None
         self.timeSteps = None
+        self.stepSizes = None
 
     def addSpecies(self, species):
         """
@@ -44,6 +62,20 @@ class GenericSystem:
         else:
             self.globalSpecies.append(species)
 
+    def addReactions(self, reactions):
+        """
+        Adds a single first order reaction or a list of reactions to the model
+
+        Args:
+            reactions: List of reactions or single reaction object to add to
+                       the model
+        """
+        if isinstance(reactions, Iterable):
+            for reaction in reactions:
+                self.reactions.append(reaction)
+        else:
+            self.reactions.append(reactions)
+
     def addComponents(self, components):
         """
         Adds a single component or list of components
@@ -66,7 +98,8 @@ class GenericSystem:
             else:
                 self.components.append(components)
 
-    def addConnection(self, feedComponent, targetComponent, feedComponentFraction):
+    def addConnection(self, feedComponent, targetComponent, feedComponentFraction = None,
+        flowRate = None):
         """
         Adds a connection between two components passed as a list or single values.
 
@@ -76,13 +109,30 @@ class GenericSystem:
         |                |        |                  |
          ----------------          ------------------
 
+        The flow of the connection is either given as a fraction of the system
+        volumetric flow rate or as an absolute flow rate. Absolute flow rates
+        allow streams at different rates, like recycle loops and side draws,
+        and do not change when the system flow rate changes.
+
         Args:
             feedComponent:         Component that feeds the inlet component
             inletComponent:        Component that receives the feed
             feedComponentFraction: Fraction of flow from feed component that goes
                                    into the inlet component
+            flowRate:              Absolute volumetric flow rate of the
+                                   connection in m^3/s
         """
         assert(not self.areComponentFinalized)
+        assert((feedComponentFraction is None) != (flowRate is None))
+        if flowRate is None:
+            self.connections.append((feedComponent, targetComponent, feedComponentFraction, 0.0))
+        else:
+            assert(flowRate >= 0.0)
+            self.connections.append((feedComponent, targetComponent, 0.0, flowRate))
+            # The components list the connection with its fraction of the
+            # current system flow rate
+            feedComponentFraction = (flowRate / self.volumetricFlowRate
+                if self.volumetricFlowRate > 0.0 else 0.0)
         # Adds inlet flow for target component
         targetComponent.addFlowComponent(feedComponentFraction, feedComponent, "inlet")
         # Adds the outlet flow for the feed component
@@ -110,94 +160,403 @@ class GenericSystem:
 
     def setSolver(self, solver):
         """
-        Sets the solver for the system
+        Sets the solver for the system. The default is the dense ExpmSolver,
+        large systems should use the sparse KrylovSolver.
 
         Args:
             solver: The solver object
         """
+        assert(isinstance(solver, SolverBase))
         self.solver = solver
 
-    def solve(self, tEnd, numSteps):
+    def setPropagatorCache(self, propagatorCache):
+        """
+        Sets the propagator cache used by the solve. Systems can share a cache
+        so that identical plants only compute their propagators once.
+
+        Args:
+            propagatorCache: The propagator cache object
+        """
+        self.propagatorCache = propagatorCache
+
+    def setStorage(self, storage):
+        """
+        Sets where the solution history is stored. The default keeps every
+        step in memory, MemmapStorage streams the steps to disk and both can
+        keep only every k-th step.
+
+        Args:
+            storage: The storage object
+        """
+        assert(isinstance(storage, StorageBase))
+        self.storage = storage
+
+    def setSchedule(self, schedule):
+        """
+        Sets a piecewise constant operating schedule for the solve. Passing
+        None removes the schedule.
+
+        Args:
+            schedule: The schedule object
+        """
+        assert(schedule is None or isinstance(schedule, Schedule))
+        self.schedule = schedule
+
+    def setStats(self, stats):
+        """
+        Sets the stats object that records the wall time, call count, matrix
+        size and memory of every phase, and calls the step callbacks. Passing
+        None turns the instrumentation off, which is the default.
+
+        Args:
+            stats: The stats object
+        """
+        assert(stats is None or isinstance(stats, SolveStats))
+        self.stats = stats
+
+    def compile(self):
+        """
+        Freezes the finalized system into a compiled model. The component and
+        species objects are walked once and their parameters, connections,
+        current concentrations and reactions are copied into flat arrays, so
+        later changes to the objects do not affect the model.
+        """
+        assert(self.areComponentFinalized and self.areSpeciesFinalized)
+        if self.stats is not None:
+            self.stats.startPhase('compile')
+        boundaryCons = self.speciesTable.getCurrentConcentrations()[len(self.components):]
+
+        reactantIDs = []
+        productIDs = []
+        rateConstants = []
+        productFractions = []
+        reactionComponentIDs = []
+        for reaction in self.reactions:
+            assert(reaction.reactantName in self.speciesIndex)
+            assert(reaction.productName is None or reaction.productName in self.speciesIndex)
+            if reaction.componentNames is None:
+                reactionComponents = [-1]
+            else:
+                reactionComponents = [self.componentIndex[name] for name in reaction.componentNames]
+            for componentID in reactionComponents:
+                reactantIDs.append(self.speciesIndex[reaction.reactantName])
+                productIDs.append(-1 if reaction.productName is None
+                    else self.speciesIndex[reaction.productName])
+                rateConstants.append(reaction.rateConstant)
+                productFractions.append(reaction.productFraction)
+                reactionComponentIDs.append(componentID)
+
+        model = CompiledModel(self.name,
+            [component.name for component in self.components],
+            [component.name for component in self.boundaryComponents],
+            [spec.name for spec in self.globalSpecies],
+            [component.volume for component in self.components],
+            self.volumetricFlowRate, self.flowGraph.feedIDs, self.flowGraph.feedBoundaryIDs,
+            self.flowGraph.targetIDs, self.flowGraph.targetBoundaryIDs,
+            self.flowGraph.flowFractions, self.__buildInitialCondition(), boundaryCons,
+            reactantIDs, productIDs, rateConstants, productFractions, reactionComponentIDs,
+            self.flowGraph.flowRates)
+        if self.stats is not None:
+            self.stats.endPhase('compile', model.A)
+        return model
+
+    def solve(self, tEnd, numSteps, steadyStateTolerance = None):
         """
         Solves the system for species masses. Assumes that the start time is 0
 
         Args:
-            tEnd:     End time of the simulation
-            numSteps: Number of steps to take
-        """
-        A = self.__buildTransitionMatrix()
-        dt = tEnd/float(numSteps)
-        A = A.toarray()
-        for step in range(1, numSteps+1):
-            b = self.__buildInitialCondition()
-            sol = expm(A * dt) @ b
-            self.__unpackSolution(sol)
+            tEnd:                 End time of the simulation
+            numSteps:             Number of steps to take
+            steadyStateTolerance: If given, the solve stops early once the
+                                  largest change over one step is below this
+                                  fraction of the largest concentration. Only
+                                  checked after the last schedule breakpoint.
+        """
+        model = self.compile()
+        self.timeSteps, self.solutionArray = model.solve(tEnd, numSteps, self.solver,
+            self.propagatorCache, self.storage, self.schedule, steadyStateTolerance,
+            stats = self.stats)
         # Unpacks the final solution to a dict for easy access
+        if self.stats is not None:
+            self.stats.startPhase('unpackSolution')
+        self.__buildSolutionData()
+        if self.stats is not None:
+            self.stats.endPhase('unpackSolution')
+
+    def solveAdaptive(self, tEnd, tolerance = 1e-4, minStep = None):
+        """
+        Solves the system with step sizes chosen so that linearly
+        interpolating the stored solution is accurate to the tolerance,
+        relative to the largest concentration. Small fast tanks get small
+        steps during their transients and the slow tail gets large ones. The
+        solution is stored like solve, and the sizes of the steps taken are
+        stored in stepSizes. Schedules are not supported.
+
+        Args:
+            tEnd:      End time of the simulation
+            tolerance: Largest relative interpolation error
+            minStep:   Smallest step size, defaults to a size that resolves
+                       the fastest rate of the system
+        """
+        assert(self.schedule is None)
+        model = self.compile()
+        self.timeSteps, self.solutionArray, self.stepSizes = model.solveAdaptive(tEnd,
+            tolerance, minStep, self.solver, self.propagatorCache, stats = self.stats)
         self.__buildSolutionData()
-        self.timeSteps = np.linspace(0, tEnd, numSteps+1)
+
+    def solveSteadyState(self, method = 'direct', tolerance = 1e-10):
+        """
+        Solves directly for the long time solution of dy / dt = A * y + s by
+        solving the linear system A * y = -s, without time stepping. Species
+        decoupled systems solve the small component level system for all
+        species at once. The steady state is stored as a single step solution
+        with a time of infinity, so a following solve starts from it, and is
+        also returned as a (components x species) array. Recycle loops and
+        tanks without an outlet keep the mass they hold or receive, see
+        CompiledModel.solveSteadyState. Schedules are not supported.
+
+        Args:
+            method:    'direct' for a sparse LU factorization or 'iterative'
+                       for GMRES
+            tolerance: Relative tolerance of the iterative solve
+        """
+        assert(self.schedule is None)
+        steadyState = self.compile().solveSteadyState(method, tolerance)
+        self.solutionArray = steadyState.reshape((1,) + steadyState.shape)
+        self.__buildSolutionData()
+        self.timeSteps = np.array([np.inf])
+        return steadyState
+
+    def solveAtTimes(self, times):
+        """
+        Solves the system at an arbitrary array of output times, e.g.
+        logarithmically spaced, from one factorization of the transition
+        matrix instead of stepping. Uses the system solver if it is an
+        EigenSolver and a default EigenSolver otherwise. The solution is
+        stored like solve, with timeSteps set to the output times. Schedules
+        are not supported since A must be constant.
+
+        Args:
+            times: Array of output times in seconds, all >= 0
+        """
+        assert(self.schedule is None)
+        solver = self.solver if isinstance(self.solver, EigenSolver) else EigenSolver()
+        self.solutionArray = self.compile().solveAtTimes(times, solver)
+        self.__buildSolutionData()
+        self.timeSteps = np.asarray(times, dtype=float)
+
+    def solveEnsemble(self, variants, tEnd, numSteps, saveEvery = 1, maxWorkers = None):
+        """
+        Solves many variants of the finalized system and returns the times of
+        the stored steps and one array of shape (variants, stored steps,
+        components, species). The finalized topology and index layout are
+        reused for every variant and the system itself is not changed.
+        Variants with identical transition matrices are advanced together as
+        one matrix product on a block of initial conditions. The remaining
+        groups are spread over a process pool when maxWorkers is larger than
+        one. Schedules are not applied to ensembles.
+
+        Args:
+            variants:   List of variant objects
+            tEnd:       End time of the simulation
+            numSteps:   Number of steps to take
+            saveEvery:  Only every saveEvery-th step is stored
+            maxWorkers: Number of worker processes, None solves in this process
+        """
+        assert(self.schedule is None)
+        return self.compile().solveEnsemble(variants, tEnd, numSteps, saveEvery,
+            maxWorkers, self.solver, self.propagatorCache)
 
     def plot(self, componentName = None, speciesName = None):
         """
-        Plots the solution
+        Plots the solution and saves it to a png file. Given only a species
+        name, the species is plotted in every component. Given only a
+        component name, every species in the component is plotted. matplotlib
+        is only imported when this is called.
+
+        Args:
+            componentName: Name of the component
+            speciesName:   Name of the species
         """
-        if (speciesName and not componentName):
-            for component in self.components:
-                solution = self.getSolution(component.name, speciesName)
-                plt.plot(self.timeSteps, solution, label = "Tank A")
+        assert(bool(componentName) != bool(speciesName))
+        from CheUnitOp import plotting
+        if speciesName:
+            return plotting.plotSpecies(self, speciesName,
+                f"{self.name}_species_concentrations_in_operations.png")
+        return plotting.plotComponent(self, componentName)
 
-            plt.legend()
-            plt.grid()
-            plt.title(f"{speciesName}")
-            plt.xlabel("Time [sec]")
-            plt.ylabel("Concentration")
-            plt.savefig(f"{self.name}_species_concentrations_in_operations.png")
-        
-        else:
-            print("Something went wrong")
-            exit()
+    def exportPlots(self, directory = ".", fileFormat = "png"):
+        """
+        Renders every species and component plot in one pass with the non
+        interactive Agg backend and saves them to a directory. Returns the
+        names of the written files.
+
+        Args:
+            directory:  Directory the plots are saved to
+            fileFormat: Image format understood by matplotlib, e.g. png or pdf
+        """
+        from CheUnitOp import plotting
+        return plotting.exportPlots(self, directory, fileFormat)
 
+    def exportCSV(self, fileName, delimiter = ","):
+        """
+        Writes the solution to a CSV file with a time column and one column
+        per component and species. Does not need matplotlib.
+
+        Args:
+            fileName:  Name of the CSV file
+            delimiter: Column delimiter
+        """
+        export.exportCSV(self, fileName, delimiter)
+
+    def saveFlowsheet(self, fileName):
+        """
+        Writes the finalized system to a flowsheet file that can be loaded
+        with CheUnitOp.flowsheet.loadFlowsheet. The format is picked by the
+        extension, .json, .toml or .npz.
+
+        Args:
+            fileName: Name of the file
+        """
+        # Imported here since the flowsheet module builds systems
+        from CheUnitOp import flowsheet
+        flowsheet.saveFlowsheet(self, fileName)
 
     def getSolution(self, componentName = None, speciesName = None):
         """
-        Gets the soltuion
+        Gets the soltuion. Concentration histories are views into the solution
+        array, so no data is copied.
         """
         assert(self.solutionData)
         if (componentName and not speciesName):
             return self.solutionData[componentName]
         elif (componentName and speciesName):
-            return self.solutionData[componentName][speciesName]
+            return self.solutionArray[:, self.componentIndex[componentName],
+                self.speciesIndex[speciesName]]
         else:
-            return self.soltuionData
+            return self.solutionData
 
     def finalizeComponents(self):
         """
-        Finilizes the system components
+        Finilizes the system components and builds the name to ID indexes
+        of the components and boundary components
         """
-        for cID, component in enumerate(self.components):
-            component._checkInletOutletFlowRates()
-            component.ID = cID
-
+        if self.stats is not None:
+            self.stats.startPhase('finalizeComponents')
+        self.__buildComponentIndexes()
+        self.flowGraph = self.__buildFlowGraph()
+        self.flowGraph.checkMassBalance(self.volumetricFlowRate)
         self.areComponentFinalized = True
+        if self.stats is not None:
+            self.stats.endPhase('finalizeComponents')
 
     def finalizeSpecies(self):
         """
-        Finilizes the species in the system
-        """
-        totalComponents = self.components + self.boundaryComponents
-        componentNames = [component.name for component in totalComponents]
-        for component in totalComponents:
-            for sID, spec in enumerate(self.globalSpecies):
-                componentInitialMass = 0.0
-                spec.ID = sID
-                for initialComponentConcentrationTupe in spec.componentInitialConcentration:
-                    componentName = initialComponentConcentrationTupe[0]
-                    assert(componentName in componentNames)
-                    if componentName == component.name:
-                        componentInitialCon = initialComponentConcentrationTupe[1]
-                component.addSpecies(ComponentSpecies(spec.name, spec.molarMass,
-                component.name, sID, componentInitialCon))
+        Finilizes the species in the system and builds the name to ID index of
+        the species. Components without an initial concentration for a species
+        start at 0. The components must be finalized first.
+
+        The species of all components are stored in one ComponentSpeciesTable
+        and the species of a component are views into it, so no object is
+        created per (component, species) pair.
+        """
+        assert(self.areComponentFinalized)
+        if self.stats is not None:
+            self.stats.startPhase('finalizeSpecies')
+        # Boundary components follow the components, like in the flow graph
+        nodeIndex = dict(self.componentIndex)
+        for componentName, bID in self.boundaryIndex.items():
+            nodeIndex[componentName] = len(self.components) + bID
+        initialCons = np.zeros((len(nodeIndex), len(self.globalSpecies)))
+        for sID, spec in enumerate(self.globalSpecies):
+            # Later entries for the same component override earlier ones
+            for componentName, initialCon in spec.componentInitialConcentration:
+                assert(componentName in nodeIndex)
+                initialCons[nodeIndex[componentName], sID] = initialCon
+        self.__buildSpeciesTable(initialCons)
+
+        self.areSpeciesFinalized = True
+        if self.stats is not None:
+            self.stats.endPhase('finalizeSpecies')
+
+    def finalizeFromArrays(self, feedNodeIDs, targetNodeIDs, flowFractions, flowRates,
+        initialConcentrations):
+        """
+        Finalizes the components and species in one vectorized pass from
+        arrays, instead of from addConnection calls and the initial
+        concentrations of the species. This is the bulk load path of
+        flowsheet files. The components and species must be added but not
+        finalized, and no connections may be added. Nodes are numbered like
+        in the species table: the components in the order they were added,
+        then the boundary components.
+
+        Args:
+            feedNodeIDs:           Feed node ID of every connection
+            targetNodeIDs:         Target node ID of every connection
+            flowFractions:         Flow fraction of every connection
+            flowRates:             Absolute flow rate of every connection in
+                                   m^3/s
+            initialConcentrations: (nodes x species) initial concentrations in
+                                   kg/m^3
+        """
+        assert(not self.areComponentFinalized and not self.areSpeciesFinalized)
+        assert(not self.connections)
+        if self.stats is not None:
+            self.stats.startPhase('finalizeFromArrays')
+        self.__buildComponentIndexes()
+        nodes = self.components + self.boundaryComponents
+        numComponents = len(self.components)
+        feedNodeIDs = np.asarray(feedNodeIDs, dtype=np.int64)
+        targetNodeIDs = np.asarray(targetNodeIDs, dtype=np.int64)
+        flowFractions = np.asarray(flowFractions, dtype=float)
+        flowRates = np.asarray(flowRates, dtype=float)
+        assert(feedNodeIDs.shape == targetNodeIDs.shape == flowFractions.shape ==
+            flowRates.shape)
+        assert(np.all((feedNodeIDs >= 0) & (feedNodeIDs < len(nodes))))
+        assert(np.all((targetNodeIDs >= 0) & (targetNodeIDs < len(nodes))))
+        isFeedBoundary = feedNodeIDs >= numComponents
+        isTargetBoundary = targetNodeIDs >= numComponents
+        self.flowGraph = FlowGraph(numComponents, len(self.boundaryComponents),
+            np.where(isFeedBoundary, -1, feedNodeIDs),
+            np.where(isFeedBoundary, feedNodeIDs - numComponents, -1),
+            np.where(isTargetBoundary, -1, targetNodeIDs),
+            np.where(isTargetBoundary, targetNodeIDs - numComponents, -1),
+            flowFractions, flowRates)
+        self.flowGraph.checkMassBalance(self.volumetricFlowRate)
+
+        # The components list their connections like addConnection does
+        componentFractions = flowFractions.copy()
+        if self.volumetricFlowRate > 0.0:
+            componentFractions += flowRates / self.volumetricFlowRate
+        for feedID, targetID, flowFraction, componentFraction, flowRate in zip(
+            feedNodeIDs.tolist(), targetNodeIDs.tolist(), flowFractions.tolist(),
+            componentFractions.tolist(), flowRates.tolist()):
+            feedComponent = nodes[feedID]
+            targetComponent = nodes[targetID]
+            self.connections.append((feedComponent, targetComponent, flowFraction, flowRate))
+            targetComponent.inletComponents.append((componentFraction, feedComponent))
+            feedComponent.outletComponents.append((componentFraction, targetComponent))
+        self.areComponentFinalized = True
 
+        initialConcentrations = np.asarray(initialConcentrations, dtype=float)
+        assert(initialConcentrations.shape == (len(nodes), len(self.globalSpecies)))
+        assert(np.all(initialConcentrations >= 0.0))
+        self.__buildSpeciesTable(initialConcentrations)
         self.areSpeciesFinalized = True
+        if self.stats is not None:
+            self.stats.endPhase('finalizeFromArrays')
+
+    def getComponent(self, componentName):
+        """
+        Gets a component or boundary component by name
+
+        Args:
+            componentName: Name of the component
+        """
+        assert(self.areComponentFinalized)
+        if componentName in self.componentIndex:
+            return self.components[self.componentIndex[componentName]]
+        return self.boundaryComponents[self.boundaryIndex[componentName]]
 
     def printInfo(self):
         """
@@ -214,80 +573,85 @@ class GenericSystem:
             component.printInfo()
             print("############################")
 
-    def __buildTransitionMatrix(self):
-        """
-        Builds the transition matrix (A) for dy / dt = A * y
-        """
-        DOFs = len(self.globalSpecies) * len(self.components)
-        numSpecies = len(self.globalSpecies)
-        A = np.zeros((DOFs, DOFs))
-        for thisComponent in self.components:
-            for thisSpecies in thisComponent.species:
-                # gets i matrix diagional coefficient
-                i = self.__getAj(thisComponent.ID, thisSpecies.ID, numSpecies)
-                # i,i coefficient
-                thisCoeff = 0.0
-                # source term
-                thisSpeciesSource = 0.0
-
-                # Loops over the component connections going into this component
-                for otherComponentTuple in thisComponent.inletComponents:
-                    otherComponentFlowFraction = otherComponentTuple[0]
-                    otherComponent = otherComponentTuple[1]
-                    if otherComponent.isBoundaryComponent:
-                        thisSpeciesSource += (otherComponent.species[thisSpecies.ID].getCon() *
-                        self.volumetricFlowRate * otherComponentFlowFraction)
-                    else:
-                        transCoeff = (self.volumetricFlowRate * otherComponentFlowFraction
-                        / thisComponent.volume)
-                        j = self.__getAj(otherComponent.ID, thisSpecies.ID, numSpecies)
-                        A[i,j] = transCoeff
-
-                # Loops over the component connections going out this component
-                for otherComponentTuple in thisComponent.outletComponents:
-                    otherComponentFlowFraction = otherComponentTuple[0]
-                    otherComponent = otherComponentTuple[1]
-                    thisCoeff -= (self.volumetricFlowRate * otherComponentFlowFraction
-                    / thisComponent.volume)
-                A[i,i] = thisCoeff
-        return csr_matrix(A)
-
-    def __buildInitialCondition(self):
-        """
-        Builds the initial condition (b) for dy / dt = A * y
+    def __buildComponentIndexes(self):
         """
-        DOFs = len(self.globalSpecies) * len(self.components)
-        b = np.zeros((DOFs, 1))
-        i = 0
-        for thisComponent in self.components:
-            for thisSpecies in thisComponent.species:
-                b[i] = thisSpecies.getCon()
-                i += 1
-        return b
-
-    def __unpackSolution(self, sol):
+        Numbers the components and boundary components and builds their name
+        to ID indexes
         """
-        Unpacks the solution
+        self.componentIndex = {}
+        for cID, component in enumerate(self.components):
+            component.ID = cID
+            self.componentIndex[component.name] = cID
+        # Boundary components are numbered separately from the solved components
+        self.boundaryIndex = {}
+        for bID, component in enumerate(self.boundaryComponents):
+            component.ID = bID
+            self.boundaryIndex[component.name] = bID
+        # Component names must be unique across components and boundaries
+        assert(len(self.componentIndex) == len(self.components))
+        assert(len(self.boundaryIndex) == len(self.boundaryComponents))
+        assert(self.componentIndex.keys().isdisjoint(self.boundaryIndex))
+
+    def __buildSpeciesTable(self, initialConcentrations):
+        """
+        Numbers the species, builds their name to ID index and the species
+        table of the components
 
         Args:
-            sol: The solution vector
+            initialConcentrations: (nodes x species) initial concentrations
+        """
+        self.speciesIndex = {}
+        for sID, spec in enumerate(self.globalSpecies):
+            spec.ID = sID
+            self.speciesIndex[spec.name] = sID
+        assert(len(self.speciesIndex) == len(self.globalSpecies))
+        nodes = self.components + self.boundaryComponents
+        self.speciesTable = ComponentSpeciesTable([component.name for component in nodes],
+            len(self.components), [spec.name for spec in self.globalSpecies],
+            [spec.molarMass for spec in self.globalSpecies], initialConcentrations)
+        for nodeID, component in enumerate(nodes):
+            component.species = ComponentSpeciesSequence(self.speciesTable, nodeID)
+
+    def __buildFlowGraph(self):
+        """
+        Builds the component level flow graph from the connections in one pass
+        """
+        numConnections = len(self.connections)
+        feedIDs = np.full(numConnections, -1, dtype=np.int64)
+        feedBoundaryIDs = np.full(numConnections, -1, dtype=np.int64)
+        targetIDs = np.full(numConnections, -1, dtype=np.int64)
+        targetBoundaryIDs = np.full(numConnections, -1, dtype=np.int64)
+        flowFractions = np.empty(numConnections)
+        flowRates = np.empty(numConnections)
+        for i, (feedComponent, targetComponent, flowFraction, flowRate) in enumerate(
+            self.connections):
+            if feedComponent.isBoundaryComponent:
+                feedBoundaryIDs[i] = feedComponent.ID
+            else:
+                feedIDs[i] = feedComponent.ID
+            if targetComponent.isBoundaryComponent:
+                targetBoundaryIDs[i] = targetComponent.ID
+            else:
+                targetIDs[i] = targetComponent.ID
+            flowFractions[i] = flowFraction
+            flowRates[i] = flowRate
+        return FlowGraph(len(self.components), len(self.boundaryComponents), feedIDs,
+            feedBoundaryIDs, targetIDs, targetBoundaryIDs, flowFractions, flowRates)
+
+    def __buildInitialCondition(self):
         """
-        i = 0
-        for thisComponent in self.components:
-            for thisSpecies in thisComponent.species:
-                thisSpecies.addCon(float(sol[i]))
-                i += 1
+        Builds the (components x species) initial condition. A new solve
+        starts from the last step of the previous one.
+        """
+        if self.solutionArray is not None:
+            return np.array(self.solutionArray[-1])
+        return self.speciesTable.getCurrentConcentrations()[:len(self.components)]
 
     def __buildSolutionData(self):
         """
-        Builds the soltuion data dictionary for easy access to solution data
+        Builds the soltuion data mapping for easy access to solution data.
+        Each entry is a view into the solution array, built on access.
         """
-        self.solutionData = {}
-        for thisComponent in self.components:
-            self.solutionData[thisComponent.name] = {}
-            for thisSpecies in thisComponent.species:
-                self.solutionData[thisComponent.name][thisSpecies.name] = thisSpecies.concentrations
-
-    def __getAj(self, solutionComponentIndex, speciesIndex, totalSpecies):
-        rowsBefore = solutionComponentIndex * totalSpecies
-        return rowsBefore + speciesIndex
+        self.speciesTable.setSolution(self.solutionArray)
+        self.solutionData = SolutionData(self.solutionArray, self.componentIndex,
+            self.speciesTable.speciesNames)
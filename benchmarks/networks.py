@@ -0,0 +1,116 @@
+"""
+Synthetic plant networks for the benchmarks. Every builder returns a system
+that is finalized and ready to solve. Flow fractions are balanced by
+construction and the parameters are drawn from a seeded generator, so a
+network with the same arguments is identical on every run.
+"""
+import numpy as np
+
+from CheUnitOp.system import GenericSystem
+from CheUnitOp.component import GenericTank, InletBoundaryCondition, OutletBoundaryCondition
+from CheUnitOp.species import Species
+
+def _buildTanks(numComponents, rng):
+    """
+    Builds the tanks, inlet and outlet of a network
+
+    Args:
+        numComponents: Number of tanks
+        rng:           Random generator for the volumes
+    """
+    tanks = [GenericTank(f"Tank {i}", volume)
+        for i, volume in enumerate(rng.uniform(1.0, 10.0, numComponents))]
+    return tanks, InletBoundaryCondition("Inlet"), OutletBoundaryCondition("Outlet")
+
+def _finalize(system, tanks, inlet, numSpecies, rng):
+    """
+    Finalizes the components, then adds species with random initial
+    concentrations in every tank and a random inlet concentration
+
+    Args:
+        system:     System holding the network
+        tanks:      Tanks of the network
+        inlet:      Inlet boundary of the network
+        numSpecies: Number of species
+        rng:        Random generator for the concentrations
+    """
+    system.finalizeComponents()
+    for j in range(numSpecies):
+        cons = rng.uniform(0.0, 100.0, len(tanks))
+        system.addSpecies(Species(f"Species {j}", componentInitialConcentration =
+            [(tank.name, con) for tank, con in zip(tanks, cons)] +
+            [(inlet.name, rng.uniform(0.0, 10.0))]))
+    system.finalizeSpecies()
+    return system
+
+def buildChain(numComponents, numSpecies, seed = 0):
+    """
+    Builds a chain of tanks in series, inlet -> tank 0 -> ... -> outlet
+
+    Args:
+        numComponents: Number of tanks
+        numSpecies:    Number of species
+        seed:          Seed of the random parameters
+    """
+    rng = np.random.default_rng(seed)
+    system = GenericSystem("Chain", 1.0)
+    tanks, inlet, outlet = _buildTanks(numComponents, rng)
+    system.addComponents(tanks + [inlet, outlet])
+    nodes = [inlet] + tanks + [outlet]
+    for feed, target in zip(nodes[:-1], nodes[1:]):
+        system.addConnection(feed, target, 1.0)
+    return _finalize(system, tanks, inlet, numSpecies, rng)
+
+def buildRecycle(numComponents, numSpecies, recycleFraction = 0.5, seed = 0):
+    """
+    Builds a chain of tanks where the last tank sends part of its outflow back
+    to the first tank. Every tank carries 1 + recycleFraction times the system
+    flow rate.
+
+    Args:
+        numComponents:   Number of tanks
+        numSpecies:      Number of species
+        recycleFraction: Recycled flow as a fraction of the system flow rate
+        seed:            Seed of the random parameters
+    """
+    rng = np.random.default_rng(seed)
+    system = GenericSystem("Recycle", 1.0)
+    tanks, inlet, outlet = _buildTanks(numComponents, rng)
+    system.addComponents(tanks + [inlet, outlet])
+    system.addConnection(inlet, tanks[0], 1.0)
+    for feed, target in zip(tanks[:-1], tanks[1:]):
+        system.addConnection(feed, target, 1.0 + recycleFraction)
+    system.addConnection(tanks[-1], tanks[0], recycleFraction)
+    system.addConnection(tanks[-1], outlet, 1.0)
+    return _finalize(system, tanks, inlet, numSpecies, rng)
+
+def buildRandomDAG(numComponents, numSpecies, seed = 0):
+    """
+    Builds a random directed acyclic network with splits. Tank i always feeds
+    tank i+1 and splits a random part of its outflow to a random later tank,
+    so every tank is reached. The last tank feeds the outlet.
+
+    Args:
+        numComponents: Number of tanks
+        numSpecies:    Number of species
+        seed:          Seed of the random parameters
+    """
+    rng = np.random.default_rng(seed)
+    system = GenericSystem("Random DAG", 1.0)
+    tanks, inlet, outlet = _buildTanks(numComponents, rng)
+    system.addComponents(tanks + [inlet, outlet])
+    system.addConnection(inlet, tanks[0], 1.0)
+    inflows = np.zeros(numComponents)
+    inflows[0] = 1.0
+    for i in range(numComponents - 1):
+        splitFraction = rng.uniform(0.2, 0.8) if i + 2 < numComponents else 1.0
+        system.addConnection(tanks[i], tanks[i+1], inflows[i] * splitFraction)
+        inflows[i+1] += inflows[i] * splitFraction
+        if splitFraction < 1.0:
+            j = rng.integers(i + 2, numComponents)
+            system.addConnection(tanks[i], tanks[j], inflows[i] * (1.0 - splitFraction))
+            inflows[j] += inflows[i] * (1.0 - splitFraction)
+    system.addConnection(tanks[-1], outlet, inflows[-1])
+    return _finalize(system, tanks, inlet, numSpecies, rng)
+
+NETWORKS = {'chain': buildChain, 'recycle': buildRecycle, 'dag': buildRandomDAG}
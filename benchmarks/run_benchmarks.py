@@ -0,0 +1,235 @@
+"""
+Benchmarks network building, finalization, matrix assembly and solve
+throughput on synthetic plant networks, and checks the accuracy of the
+solution against a reference ODE integrator.
+
+Results are written as JSON. A saved result can be passed back as a baseline
+and the run fails with exit code 1 when a case got slower, used more memory or
+lost accuracy beyond the given tolerances.
+
+Usage:
+    python benchmarks/run_benchmarks.py --output results.json
+    python benchmarks/run_benchmarks.py --baseline results.json
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import scipy
+from scipy.integrate import solve_ivp
+
+# Runs from a checkout without installing the package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from CheUnitOp.solver import ExpmSolver, KrylovSolver, SparseExpmSolver
+from networks import NETWORKS
+
+SOLVERS = {'expm': ExpmSolver, 'krylov': KrylovSolver, 'sparse': SparseExpmSolver}
+
+# (network, components, species) of every case
+SUITES = {
+    'quick': [('chain', 10, 1), ('recycle', 10, 2), ('dag', 20, 2)],
+    'default': [('chain', 10, 1), ('chain', 200, 2), ('recycle', 10, 2),
+        ('recycle', 200, 2), ('dag', 20, 2), ('dag', 500, 3)],
+    'large': [('chain', 2000, 2), ('recycle', 2000, 2), ('dag', 5000, 3)],
+}
+
+# Metrics that are compared against the baseline and fail when they grow
+TIME_METRICS = ['buildTime', 'finalizeTime', 'assemblyTime', 'solveTime']
+MEMORY_METRICS = ['peakSolveMemory']
+
+def _timeIt(function, repeats):
+    """
+    Calls a function repeats times and returns the shortest time and the
+    result of the last call
+
+    Args:
+        function: Function without arguments
+        repeats:  Number of calls
+    """
+    bestTime = np.inf
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = function()
+        bestTime = min(bestTime, time.perf_counter() - start)
+    return bestTime, result
+
+def _getReferenceError(system, tEnd, numSteps):
+    """
+    Gets the largest error of the solution relative to the largest
+    concentration, against a tightly converged implicit ODE integrator
+
+    Args:
+        system:   Solved system object
+        tEnd:     End time of the solve
+        numSteps: Number of steps of the solve
+    """
+    model = system.compile()
+    A, s = model.buildTransitionMatrix()
+    s = np.ravel(s)
+    y0 = np.ravel(system.solutionArray[0])
+    times = np.linspace(0.0, tEnd, numSteps+1)
+    reference = solve_ivp(lambda t, y: A @ y + s, (0.0, tEnd), y0, method = 'Radau',
+        t_eval = times, jac = A, rtol = 1e-10, atol = 1e-12)
+    solution = np.reshape(system.solutionArray, (numSteps+1, -1))
+    return np.abs(solution - reference.y.T).max() / np.abs(reference.y).max()
+
+def runCase(networkName, numComponents, numSpecies, solverName, numSteps, repeats,
+    maxReferenceDOFs):
+    """
+    Runs one benchmark case and returns its metrics
+
+    Args:
+        networkName:      Key of the network builder
+        numComponents:    Number of tanks
+        numSpecies:       Number of species
+        solverName:       Key of the solver
+        numSteps:         Number of steps of the solve
+        repeats:          Timings are the best of this many runs
+        maxReferenceDOFs: Largest system checked against the ODE integrator
+    """
+    buildNetwork = NETWORKS[networkName]
+    buildTime, system = _timeIt(lambda: buildNetwork(numComponents, numSpecies), repeats)
+
+    # Finalization is timed on its own by undoing it on a fresh network
+    def finalize():
+        thisSystem = buildNetwork(numComponents, numSpecies)
+        for component in thisSystem.components + thisSystem.boundaryComponents:
+            component.species = []
+        start = time.perf_counter()
+        thisSystem.finalizeComponents()
+        thisSystem.finalizeSpecies()
+        return time.perf_counter() - start
+    finalizeTime = min(finalize() for _ in range(repeats))
+
+    assemblyTime, model = _timeIt(system.compile, repeats)
+    # The solve time is the total time of the solve divided into steps, with
+    # the outflow residence time of the whole plant as the end time
+    tEnd = float(np.sum(model.volumes) / model.volumetricFlowRate)
+
+    def solve():
+        thisSystem = buildNetwork(numComponents, numSpecies)
+        thisSystem.setSolver(SOLVERS[solverName]())
+        start = time.perf_counter()
+        thisSystem.solve(tEnd, numSteps)
+        return time.perf_counter() - start, thisSystem
+    solveTime = np.inf
+    for _ in range(repeats):
+        thisSolveTime, solvedSystem = solve()
+        solveTime = min(solveTime, thisSolveTime)
+
+    # Memory is traced in a separate run so the tracing does not slow the
+    # timed runs
+    memorySystem = buildNetwork(numComponents, numSpecies)
+    memorySystem.setSolver(SOLVERS[solverName]())
+    tracemalloc.start()
+    memorySystem.solve(tEnd, numSteps)
+    peakSolveMemory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    numDOFs = numComponents * numSpecies
+    relativeError = None
+    if numDOFs <= maxReferenceDOFs:
+        relativeError = float(_getReferenceError(solvedSystem, tEnd, numSteps))
+
+    return {'network': networkName, 'numComponents': numComponents,
+        'numSpecies': numSpecies, 'numDOFs': numDOFs, 'solver': solverName,
+        'numSteps': numSteps, 'tEnd': tEnd, 'nnz': int(model.A.nnz),
+        'buildTime': buildTime, 'finalizeTime': finalizeTime,
+        'assemblyTime': assemblyTime, 'solveTime': solveTime,
+        'stepsPerSecond': numSteps / solveTime, 'peakSolveMemory': peakSolveMemory,
+        'relativeError': relativeError}
+
+def getCaseName(case):
+    """
+    Gets the name a case is stored under in the results
+
+    Args:
+        case: Metrics of the case
+    """
+    return (f"{case['network']}-{case['numComponents']}x{case['numSpecies']}"
+        f"-{case['solver']}-{case['numSteps']}")
+
+def compareToBaseline(results, baseline, timeTolerance, memoryTolerance, errorTolerance,
+    timeFloor):
+    """
+    Compares the results to a baseline and returns a list of messages, one per
+    regression. Cases that are not in the baseline are skipped.
+
+    Args:
+        results:         Results of this run
+        baseline:        Results of the baseline run
+        timeTolerance:   Allowed relative growth of the times
+        memoryTolerance: Allowed relative growth of the peak memory
+        errorTolerance:  Largest allowed relative error
+        timeFloor:       Time growth in seconds that is always allowed, so
+                         timer noise on very short phases is not reported
+    """
+    regressions = []
+    for name, case in results['cases'].items():
+        if case['relativeError'] is not None and case['relativeError'] > errorTolerance:
+            regressions.append(f"{name}: relative error {case['relativeError']:.3e} "
+                f"is above {errorTolerance:.1e}")
+        if name not in baseline['cases']:
+            continue
+        baselineCase = baseline['cases'][name]
+        for metrics, tolerance, floor in ((TIME_METRICS, timeTolerance, timeFloor),
+            (MEMORY_METRICS, memoryTolerance, 0.0)):
+            for metric in metrics:
+                if case[metric] > baselineCase[metric] * (1.0 + tolerance) + floor:
+                    regressions.append(f"{name}: {metric} {case[metric]:.4g} is more than "
+                        f"{tolerance:.0%} above the baseline {baselineCase[metric]:.4g}")
+    return regressions
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = __doc__.split("\n\n")[0])
+    parser.add_argument('--suite', choices = sorted(SUITES), default = 'default')
+    parser.add_argument('--solver', choices = sorted(SOLVERS), default = 'expm')
+    parser.add_argument('--steps', type = int, default = 100)
+    parser.add_argument('--repeats', type = int, default = 5)
+    parser.add_argument('--max-reference-dofs', type = int, default = 2000)
+    parser.add_argument('--output', help = "JSON file the results are written to")
+    parser.add_argument('--baseline', help = "JSON file of a previous run to compare to")
+    parser.add_argument('--time-tolerance', type = float, default = 0.25)
+    parser.add_argument('--time-floor', type = float, default = 0.005)
+    parser.add_argument('--memory-tolerance', type = float, default = 0.10)
+    parser.add_argument('--error-tolerance', type = float, default = 1e-6)
+    args = parser.parse_args(argv)
+
+    results = {'python': platform.python_version(), 'numpy': np.__version__,
+        'scipy': scipy.__version__, 'platform': platform.platform(),
+        'suite': args.suite, 'cases': {}}
+    print(f"{'case':<32} {'build':>9} {'finalize':>9} {'assembly':>9} {'steps/s':>10} "
+        f"{'peak MB':>8} {'rel err':>9}")
+    for networkName, numComponents, numSpecies in SUITES[args.suite]:
+        case = runCase(networkName, numComponents, numSpecies, args.solver, args.steps,
+            args.repeats, args.max_reference_dofs)
+        name = getCaseName(case)
+        results['cases'][name] = case
+        error = "-" if case['relativeError'] is None else f"{case['relativeError']:.2e}"
+        print(f"{name:<32} {case['buildTime']:9.4f} {case['finalizeTime']:9.4f} "
+            f"{case['assemblyTime']:9.4f} {case['stepsPerSecond']:10.1f} "
+            f"{case['peakSolveMemory'] / 2**20:8.2f} {error:>9}")
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent = 2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        regressions = compareToBaseline(results, baseline, args.time_tolerance,
+            args.memory_tolerance, args.error_tolerance, args.time_floor)
+        for regression in regressions:
+            print("REGRESSION " + regression)
+        if regressions:
+            return 1
+        print("No regressions against " + args.baseline)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -7,7 +7,8 @@ setup(
     description='Python library for simulating chemical engineering unit operations',
     author='Zack Taylor',
     platforms=["Linux", "Mac OS-X"],
-    install_requires=['numpy', 'scipy', 'matplotlib'],
+    install_requires=['numpy', 'scipy'],
+    extras_require={'plotting': ['matplotlib']},
     #package_dir={'': 'CheUnitOp'},
     packages=find_packages(),
     include_package_data=True,
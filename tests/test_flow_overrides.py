@@ -0,0 +1,60 @@
+import pytest
+
+from CheUnitOp.system import GenericSystem
+from CheUnitOp.component import GenericTank, InletBoundaryCondition, OutletBoundaryCondition
+from CheUnitOp.species import Species
+from CheUnitOp.ensemble import Variant
+from CheUnitOp.schedule import Schedule
+
+def buildModel(flowRate = None):
+    """
+    Builds a single tank of 1 m^3 fed from an inlet at a system flow rate of
+    1 m^3/s. Both connections have the given absolute flow rate, or carry the
+    whole system flow when it is None.
+    """
+    flowFraction = 1.0 if flowRate is None else None
+    system = GenericSystem("Overrides", 1.0)
+    tank = GenericTank("Tank", 1.0)
+    inlet = InletBoundaryCondition("In")
+    outlet = OutletBoundaryCondition("Out")
+    system.addComponents([tank, inlet, outlet])
+    system.addConnection(inlet, tank, flowFraction, flowRate = flowRate)
+    system.addConnection(tank, outlet, flowFraction, flowRate = flowRate)
+    system.finalizeComponents()
+    system.addSpecies(Species("X", componentInitialConcentration = [("In", 1.0)]))
+    system.finalizeSpecies()
+    return system.compile()
+
+def setFlowFraction(schedule, time, flowFraction):
+    schedule.setFlowFraction(time, "In", "Tank", flowFraction)
+    schedule.setFlowFraction(time, "Tank", "Out", flowFraction)
+
+def setFlowRate(schedule, time, flowRate):
+    schedule.setFlowRate(time, "In", "Tank", flowRate)
+    schedule.setFlowRate(time, "Tank", "Out", flowRate)
+
+def test_variantFlowFractionReplacesFlowRate():
+    model = buildModel(flowRate = 2.0)
+    configuration = Variant(flowFractions = {("In", "Tank"): 0.5,
+        ("Tank", "Out"): 0.5}).getConfiguration()
+    F, G = model.buildFlowMatrix(configuration)
+    assert F[0, 0] == pytest.approx(-0.5)
+    assert G[0, 0] == pytest.approx(0.5)
+
+def test_scheduleFlowFractionAfterFlowRate():
+    schedule = Schedule()
+    setFlowRate(schedule, 1.0, 3.0)
+    setFlowFraction(schedule, 2.0, 1.0)
+    model = buildModel()
+    flowTerms = [model.buildFlowMatrix(configuration)[0][0, 0]
+        for configuration in schedule.getConfigurations()]
+    assert flowTerms == pytest.approx([-1.0, -3.0, -1.0])
+
+def test_scheduleFlowRateAfterFlowFraction():
+    schedule = Schedule()
+    setFlowFraction(schedule, 1.0, 0.5)
+    setFlowRate(schedule, 2.0, 3.0)
+    model = buildModel()
+    flowTerms = [model.buildFlowMatrix(configuration)[0][0, 0]
+        for configuration in schedule.getConfigurations()]
+    assert flowTerms == pytest.approx([-1.0, -0.5, -3.0])
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from CheUnitOp.system import GenericSystem
+from CheUnitOp.component import GenericTank, InletBoundaryCondition, OutletBoundaryCondition
+from CheUnitOp.species import Species
+from CheUnitOp.solver import ExpmSolver, SparseExpmSolver
+
+def buildStiffModel(numTanks):
+    """
+    Builds a chain of tanks with volumes from 1e-3 m^3 to 1e3 m^3 and a
+    recycle loop over the middle three tanks, fed at 1 m^3/s
+    """
+    system = GenericSystem("Stiff", 1.0)
+    volumes = np.logspace(-3.0, 3.0, numTanks)
+    tanks = [GenericTank("Tank%d" % i, volume) for i, volume in enumerate(volumes)]
+    inlet = InletBoundaryCondition("In")
+    outlet = OutletBoundaryCondition("Out")
+    system.addComponents(tanks + [inlet, outlet])
+    system.addConnection(inlet, tanks[0], 1.0)
+    loopStart = numTanks // 2 - 1
+    for i in range(numTanks - 1):
+        if i == loopStart + 2:
+            system.addConnection(tanks[i], tanks[loopStart], 0.5)
+            system.addConnection(tanks[i], tanks[i + 1], 1.0)
+        elif loopStart <= i < loopStart + 2:
+            system.addConnection(tanks[i], tanks[i + 1], 1.5)
+        else:
+            system.addConnection(tanks[i], tanks[i + 1], 1.0)
+    system.addConnection(tanks[-1], outlet, 1.0)
+    system.finalizeComponents()
+    system.addSpecies(Species("X", componentInitialConcentration = [("Tank0", 5.0), ("In", 1.0)]))
+    system.finalizeSpecies()
+    return system.compile()
+
+@pytest.mark.parametrize("numTanks", [5, 40])
+@pytest.mark.parametrize("dt", [1.0, 100.0, 1e4])
+def test_sparsePropagatorMatchesExpm(numTanks, dt):
+    A, s = buildStiffModel(numTanks).buildTransitionMatrix()
+    reference = ExpmSolver().buildPropagator(A, dt).matrix
+    propagator = SparseExpmSolver().buildPropagator(A, dt).matrix
+    if hasattr(propagator, 'toarray'):
+        propagator = propagator.toarray()
+    # Entries are fractions of the content of a DOF, and the bound is set by
+    # the error of dense expm itself on the stiff steps
+    assert np.abs(propagator - reference).max() <= 1e-11
+
+def test_sparseSolveMatchesExpm():
+    model = buildStiffModel(40)
+    times, reference = model.solve(1e4, 100, ExpmSolver())
+    times, solution = model.solve(1e4, 100, SparseExpmSolver())
+    assert np.abs(solution - reference).max() <= 1e-10 * np.abs(reference).max()
+
+def test_dropToleranceBoundsError():
+    A, s = buildStiffModel(40).buildTransitionMatrix()
+    reference = ExpmSolver().buildPropagator(A, 100.0).matrix
+    errors = []
+    for dropTolerance in (1e-17, 1e-14, 1e-12):
+        propagator = SparseExpmSolver(dropTolerance, 1.0).buildPropagator(A, 100.0).matrix
+        errors.append(np.abs(propagator - reference).max() / np.abs(reference).max())
+        assert errors[-1] <= 1e6 * dropTolerance
+    assert errors[0] < errors[1] < errors[2]